@@ -1,9 +1,57 @@
+import hashlib
+import json
+import os
 import re
+import time
+
+from instrumentation import count, span, timed
+
+# Pattern for the card line: ID, count (0-3), and card name after "--"
+CARD_PATTERN = re.compile(r"(\d+)\s+(\d+)\s+--\s*(.*)")
+# Pattern for the title line: date and identifier
+TITLE_PATTERN = re.compile(r"#\[(\d{4}\.\d{2})\s+([A-Za-z]+)\]")
+GROUP_HEADERS = {0: "#Forbidden", 1: "#Limited", 2: "#Semi-Limited"}
+# Changelog sections, by the new count of the card (3 or unlisted means unlimited)
+DIFF_SECTIONS = {0: "Forbidden", 1: "Limited", 2: "Semi-Limited", 3: "Unlimited"}
+
+# Parsed banlists by content hash, shared by every load_banlist call
+_parsed_banlists = {}
+# Parsed banlists saved by load_banlists for the next runs
+SNAPSHOT_FILE = "lflists.snapshot.json"
+# Derived lists written by watch mode, and the source lists each one is built from
+WATCHED_OUTPUTS = {
+    "World.new.lflist.conf": ("0TCG.lflist.conf", "OCG.lflist.conf"),
+    "Traditional.new.lflist.conf": ("0TCG.lflist.conf",),
+}
+
+class BanlistEntry:
+    """The limit and card name of one card in a banlist."""
+    __slots__ = ("limit", "name")
+
+    def __init__(self, limit, name):
+        self.limit = limit
+        self.name = name
+
+class Banlist:
+    """
+    A parsed .lflist.conf file.
+    The header is kept as the title ("#[...]") line, the name ("!...") line and any
+    other directive lines (such as "$whitelist"); cards are an {id: BanlistEntry} mapping.
+    """
+    __slots__ = ("title", "name", "directives", "entries")
+
+    def __init__(self, title="", name="", directives=None, entries=None):
+        self.title = title
+        self.name = name
+        self.directives = directives if directives is not None else []
+        self.entries = entries if entries is not None else {}
 
 def read_file(file_name):
     try:
         with open(file_name, 'r') as file:
-            return file.readlines()
+            lines = file.readlines()
+        count("banlist.lines_read", len(lines))
+        return lines
     except FileNotFoundError:
         print(f"Error: {file_name} not found!")
         return []
@@ -11,12 +59,124 @@ def read_file(file_name):
         print(f"An error occurred while reading {file_name}: {e}")
         return []
 
+@timed("banlist.parse_lflist")
+def parse_lflist(lines):
+    """
+    Parse the lines of a .lflist.conf file into a Banlist in a single pass.
+    Group comments such as "#Forbidden" are dropped; if a card ID is listed more
+    than once, the lowest count is kept.
+    """
+    banlist = Banlist()
+    entries = banlist.entries
+    match_card = CARD_PATTERN.match
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = match_card(line)
+        if match:
+            card_id = int(match.group(1))
+            limit = int(match.group(2))
+            entry = entries.get(card_id)
+            if entry is None:
+                entries[card_id] = BanlistEntry(limit, match.group(3))
+            elif limit < entry.limit:
+                entry.limit = limit
+        elif line.startswith("#["):
+            if not banlist.title:
+                banlist.title = line
+        elif line.startswith("!"):
+            if not banlist.name:
+                banlist.name = line
+        elif not line.startswith("#"):
+            banlist.directives.append(line)
+
+    count("banlist.cards_parsed", len(entries))
+    return banlist
+
+def load_banlist(file_name):
+    """
+    Read and parse a .lflist.conf file. Returns None if the file is missing or empty.
+    Parsed lists are cached by content hash, so identical or unchanged files are only
+    parsed once per process; callers must not modify the returned Banlist.
+    """
+    lines = read_file(file_name)
+    if not lines:
+        return None
+    content_hash = hashlib.blake2b("".join(lines).encode()).digest()
+    banlist = _parsed_banlists.get(content_hash)
+    if banlist is None:
+        banlist = _parsed_banlists[content_hash] = parse_lflist(lines)
+    else:
+        count("banlist.parse_cache_hits")
+    return banlist
+
+@timed("banlist.load_banlists")
+def banlist_to_json(banlist):
+    """Encode a Banlist as [title, name, directives, [[id, limit, name], ...]] for the snapshot."""
+    return [banlist.title, banlist.name, banlist.directives,
+            [[card_id, entry.limit, entry.name] for card_id, entry in banlist.entries.items()]]
+
+def banlist_from_json(data):
+    title, name, directives, entries = data
+    return Banlist(title, name, list(directives),
+                   {int(card_id): BanlistEntry(int(limit), entry_name) for card_id, limit, entry_name in entries})
+
+def load_banlists(file_names, snapshot_path=SNAPSHOT_FILE):
+    """
+    Load several lflist files and return a Banlist (or None) for each of them.
+    The parsed lists are saved to a JSON snapshot keyed on each file's path, size and
+    modification time, so files left unchanged since an earlier run (such as a history
+    folder of past lists) are neither read nor parsed again. Pass snapshot_path=None to disable it.
+    """
+    snapshot = {}
+    if snapshot_path and os.path.isfile(snapshot_path):
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            if not isinstance(snapshot, dict):
+                raise ValueError("not a JSON object")
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+            snapshot = {}
+
+    banlists = []
+    updated = {}
+    for file_name in file_names:
+        path = os.path.abspath(file_name)
+        # The state is taken before reading, so a file saved meanwhile is parsed again next time
+        state = get_file_state(file_name)
+        banlist = None
+        cached = snapshot.get(path)
+        if state is not None and isinstance(cached, list) and len(cached) == 2 and cached[0] == list(state):
+            try:
+                banlist = banlist_from_json(cached[1])
+                count("banlist.snapshot_hits")
+            except (ValueError, TypeError):
+                banlist = None
+        if banlist is None:
+            banlist = load_banlist(file_name)
+            if banlist is not None:
+                updated[path] = [list(state), banlist_to_json(banlist)]
+        banlists.append(banlist)
+
+    if snapshot_path and updated:
+        snapshot.update(updated)
+        snapshot = {path: cached for path, cached in snapshot.items() if os.path.isfile(path)}
+        temp_path = f"{snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temp_path, snapshot_path)
+    return banlists
+
+@timed("banlist.load_files")
 def load_files():
     global tcg_current_list, ocg_current_list, traditional_current_list, worlds_current_list
-    tcg_current_list = read_file("0TCG.lflist.conf")
-    ocg_current_list = read_file("OCG.lflist.conf")
-    traditional_current_list = read_file("Traditional.lflist.conf")
-    worlds_current_list = read_file("World.lflist.conf")
+    tcg_current_list = load_banlist("0TCG.lflist.conf")
+    ocg_current_list = load_banlist("OCG.lflist.conf")
+    traditional_current_list = load_banlist("Traditional.lflist.conf")
+    worlds_current_list = load_banlist("World.lflist.conf")
 
     if tcg_current_list:
         print("TCG list loaded successfully.")
@@ -27,219 +187,428 @@ def load_files():
     if worlds_current_list:
         print("Worlds list loaded successfully.")
 
-def get_latest_identifier(files):
+def get_latest_identifier(banlists):
     """
-    Get the most recent identifier and date from a list of files.
+    Get the most recent identifier and date from a list of banlists.
     """
     latest_date = None
     latest_identifier = ""
 
-    # Regular expression to capture date and identifier
-    pattern = re.compile(r"#\[(\d{4}\.\d{2})\s+([A-Za-z]+)\]")
-
-    for file_content in files:
-        first_line = file_content[0]  # Assuming file_content is a list of lines
-        match = pattern.match(first_line.strip())
+    for banlist in banlists:
+        match = TITLE_PATTERN.match(banlist.title)
         if match:
             date = match.group(1)
             identifier = match.group(2)
-            
-            # Compare dates and update if this file is more recent
+
+            # Compare dates and update if this banlist is more recent
             if latest_date is None or date > latest_date:
                 latest_date = date
                 latest_identifier = identifier
 
     return latest_date, latest_identifier
 
-
-def generate_worlds():
-    print("Option 1: Generate Worlds is executed!")
-    # Step 1: Merge the contents of tcg_current_list and ocg_current_list
-    merged_list = tcg_current_list + ocg_current_list
-    # Step 2: Remove lines that start with "#" or "!"
-    merged_list = [line for line in merged_list if not line.strip().startswith(("#", "!"))]
-    # Step 3: Sort the merged list
-    merged_list.sort()
-    # Step 4: Remove consecutive duplicates
-    merged_list = remove_consecutive_duplicates(merged_list)
-    # Step 5: Remove lines with the card pattern and apply count logic
-    merged_list = remove_card_duplicates(merged_list)
-    # Step 6: Sort the list again by count (ascending) and card name (alphabetical)
-    merged_list = sort_by_count_and_name(merged_list)
-    # Step 7: Get the latest identifier and date from the files
-    files = [tcg_current_list, ocg_current_list]
-    latest_date, latest_identifier = get_latest_identifier(files)
-
-    # Prepare the first two lines
-    first_line = f"#[{latest_date} Worlds]\n"
-    second_line = f"!{latest_date} Worlds\n"
-    # Step 8: Add the identifier lines at the beginning of the merged list
-    with open("World.new.lflist.conf", "w") as file:
-        file.write(first_line)
-        file.write(second_line)
-        file.writelines(merged_list)
-
-    print("World.new.lflist.conf has been generated, sorted, and duplicates removed.\n\n")
-
-def remove_consecutive_duplicates(merged_list):
+def iter_lflist_lines(banlist):
     """
-    Remove consecutive duplicated lines in the list.
+    Yield the lines of a banlist in .lflist.conf format: the header, then the cards sorted by
+    count (0, 1, 2, 3), card name and card ID, with group headers for the 0, 1 and 2 counts.
+    Group headers are inserted from the parsed counts as the sorted cards are emitted.
     """
-    unique_list = []
-    previous_line = None
-
-    for line in merged_list:
-        if line != previous_line:
-            unique_list.append(line)
-        previous_line = line
-    
-    return unique_list
-
-def remove_card_duplicates(merged_list):
+    for line in (banlist.title, banlist.name):
+        if line:
+            yield f"{line}\n"
+    for line in banlist.directives:
+        yield f"{line}\n"
+
+    current_limit = None
+    for card_id, entry in sorted(banlist.entries.items(), key=lambda item: (item[1].limit, item[1].name, item[0])):
+        if entry.limit != current_limit:
+            current_limit = entry.limit
+            if current_limit in GROUP_HEADERS:
+                yield f"{GROUP_HEADERS[current_limit]}\n"
+        yield f"{card_id} {entry.limit} --{entry.name}\n"
+
+def format_lflist(banlist):
+    """Format a banlist as a list of .lflist.conf lines."""
+    return list(iter_lflist_lines(banlist))
+
+def write_file_atomic(file_name, text):
     """
-    Remove duplicate card entries based on the card ID and keep the one with the lowest count.
+    Write text to file_name in a single buffered write, through a temporary file in the
+    same folder that replaces the target, so readers never see a partially written file.
     """
-    cleaned_list = []
-    card_dict = {}
-
-    # Pattern for the card line: ID, count (0-3), and card name after "--"
-    card_pattern = re.compile(r"(\d+)\s+(\d+)\s+--\s*(.*)")
-
-    for line in merged_list:
-        match = card_pattern.match(line.strip())
-        if match:
-            card_id = int(match.group(1))
-            count = int(match.group(2))
-            card_name = match.group(3)
-
-            # Check if we've seen this card ID before
-            if card_id in card_dict:
-                # If current count is lower, replace the previous line
-                if card_dict[card_id][0] > count:
-                    card_dict[card_id] = (count, line)
-            else:
-                # Store the first occurrence of the card ID
-                card_dict[card_id] = (count, line)
-        else:
-            # If the line doesn't match the card pattern, add it as is
-            cleaned_list.append(line)
-
-    # Add only the lines with the lowest count for each card ID
-    cleaned_list.extend([entry[1] for entry in sorted(card_dict.values(), key=lambda x: x[0])])
-
-    return cleaned_list
-
-def sort_by_count_and_name(merged_list):
+    temp_name = f"{file_name}.tmp"
+    try:
+        with open(temp_name, "w") as file:
+            file.write(text)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+def write_lflist(file_name, banlist):
+    with span("banlist.sort_and_write"):
+        write_file_atomic(file_name, "".join(iter_lflist_lines(banlist)))
+
+# Merge policies decide whether a candidate entry replaces the one already merged
+MERGE_POLICIES = {
+    "min": lambda current, candidate: candidate.limit < current.limit,
+    "max": lambda current, candidate: candidate.limit > current.limit,
+    # Sources are given in order of preference, so the first one listing a card wins
+    "prefer-source": lambda current, candidate: False,
+}
+
+@timed("banlist.merge")
+def merge_banlists(banlists, policy="min"):
     """
-    Sort the list first by count (0, 1, 2, 3), then by card name alphabetically,
-    and add group headers for 0, 1, and 2 counts.
+    Merge any number of banlists in one pass, resolving each card ID with a merge policy.
+    Directive lines are merged keeping their first occurrence.
     """
-    sorted_list = []
-
-    # Pattern for the card line: ID, count (0-3), and card name after "--"
-    card_pattern = re.compile(r"(\d+)\s+(\d+)\s+--\s*(.*)")
-
-    # Sorting using a custom key: first by count, then by card name
-    for line in merged_list:
-        match = card_pattern.match(line.strip())
-        if match:
-            count = int(match.group(2))
-            card_name = match.group(3)
-            sorted_list.append((count, card_name, line))
-        else:
-            sorted_list.append((float('inf'), line.strip(), line))  # For non-card lines, place at the end
-    
-    # Sorting first by count, then by card name
-    sorted_list.sort(key=lambda x: (x[0], x[1]))
-
-    # Prepare to insert group headers
-    final_list = []
-    added_forbidden = added_limited = added_semi_limited = False
-
-    for entry in sorted_list:
-        count, card_name, line = entry
-
-        if count == 0 and not added_forbidden:
-            final_list.append("#Forbidden\n")
-            added_forbidden = True
-        elif count == 1 and not added_limited:
-            final_list.append("#Limited\n")
-            added_limited = True
-        elif count == 2 and not added_semi_limited:
-            final_list.append("#Semi-Limited\n")
-            added_semi_limited = True
-
-        final_list.append(line)
-
-    return final_list
+    replace = MERGE_POLICIES[policy]
+    merged = Banlist()
+    entries = merged.entries
+
+    for banlist in banlists:
+        for card_id, entry in banlist.entries.items():
+            current = entries.get(card_id)
+            if current is None:
+                entries[card_id] = BanlistEntry(entry.limit, entry.name)
+            elif replace(current, entry):
+                current.limit = entry.limit
+                current.name = entry.name
+        merged.directives.extend(line for line in banlist.directives if line not in merged.directives)
+
+    return merged
+
+def generate_merged_list(file_names, output_file, label, policy="min"):
+    """
+    Merge the given lflist files into output_file, titled with the latest date among them.
+    Returns False if any of the files could not be loaded.
+    """
+    sources = [load_banlist(file_name) for file_name in file_names]
+    if not all(sources):
+        return False
+
+    merged = merge_banlists(sources, policy)
+    latest_date, _ = get_latest_identifier(sources)
+    merged.title = f"#[{latest_date} {label}]"
+    merged.name = f"!{latest_date} {label}"
+
+    write_lflist(output_file, merged)
+    print(f"{output_file} has been generated from {len(sources)} lists ({policy} policy).")
+    return True
+
+def build_worlds(tcg_list, ocg_list):
+    sources = [tcg_list, ocg_list]
+
+    # Merge the cards of both lists, keeping the lowest count for each card ID
+    worlds = merge_banlists(sources, "min")
+
+    # Use the latest identifier and date from the lists
+    latest_date, latest_identifier = get_latest_identifier(sources)
+    worlds.title = f"#[{latest_date} Worlds]"
+    worlds.name = f"!{latest_date} Worlds"
+    return worlds
+
+def build_tcg_traditional_list(tcg_list):
+    # Forbidden cards are limited to 1 copy in Traditional
+    return Banlist(
+        # Change the identifier to "Traditional"
+        title=re.sub(r"(TCG|OCG)", "Traditional", tcg_list.title),
+        name=re.sub(r"(TCG|OCG)", "Traditional", tcg_list.name),
+        directives=list(tcg_list.directives),
+        entries={card_id: BanlistEntry(entry.limit or 1, entry.name) for card_id, entry in tcg_list.entries.items()},
+    )
 
-import re
+def generate_worlds():
+    print("Option 1: Generate Worlds is executed!")
+    if not (tcg_current_list and ocg_current_list):
+        print("World.new.lflist.conf was not generated: 0TCG.lflist.conf and OCG.lflist.conf must both be loaded.")
+        return False
+    write_lflist("World.new.lflist.conf", build_worlds(tcg_current_list, ocg_current_list))
+    print("World.new.lflist.conf has been generated, sorted, and duplicates removed.\n\n")
 
 def generate_tcg_traditional_list():
     print("Option 2: Generate TCG Traditional List is executed!")
+    if not tcg_current_list:
+        print("Traditional.new.lflist.conf was not generated: 0TCG.lflist.conf must be loaded.")
+        return False
+    write_lflist("Traditional.new.lflist.conf", build_tcg_traditional_list(tcg_current_list))
+    print("Traditional.new.lflist.conf has been generated, count adjusted, sorted, and commented.\n\n")
 
-    # Step 1: Read the tcg_current_list file and process its contents
-    traditional_list = tcg_current_list.copy()
+DERIVED_LIST_BUILDERS = {
+    "World.new.lflist.conf": build_worlds,
+    "Traditional.new.lflist.conf": build_tcg_traditional_list,
+}
 
-    # Step 2: Change count 0 to count 1
-    traditional_list = [line if not line.strip() or not re.match(r"^\d+\s+0\s+--", line.strip()) else re.sub(r"(\d+\s+)0", r"\1 1", line) for line in traditional_list]
+def get_file_state(file_name):
+    """Returns (mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def discard_parsed_banlist(banlist):
+    """Drop a banlist from the parse cache, once a newer version of its file has been loaded."""
+    for content_hash, cached in list(_parsed_banlists.items()):
+        if cached is banlist:
+            del _parsed_banlists[content_hash]
+
+def regenerate_derived_lists(changed_files, sources):
+    """
+    Re-parse the changed source lists into `sources` ({file name: Banlist}) and rewrite
+    the derived lists built from them. A source that is missing, empty or unchanged in
+    content keeps its previous version, so half-written saves are ignored. Replaced
+    versions are dropped from the parse cache, so a long watch session keeps only the
+    latest parse of each file.
+    """
+    reparsed = set()
+    for file_name in changed_files:
+        banlist = load_banlist(file_name)
+        if banlist is None:
+            print(f"{file_name} is missing or empty, keeping the previous version.")
+        elif banlist is not sources.get(file_name):
+            previous = sources.get(file_name)
+            sources[file_name] = banlist
+            reparsed.add(file_name)
+            if previous is not None and all(previous is not other for other in sources.values()):
+                discard_parsed_banlist(previous)
+
+    for output_file, source_files in WATCHED_OUTPUTS.items():
+        if reparsed.isdisjoint(source_files):
+            continue
+        if not all(sources.get(file_name) for file_name in source_files):
+            print(f"{output_file} was not generated: {', '.join(source_files)} must all be loaded.")
+            continue
+        start_time = time.perf_counter()
+        write_lflist(output_file, DERIVED_LIST_BUILDERS[output_file](*(sources[file_name] for file_name in source_files)))
+        print(f"{output_file} regenerated in {(time.perf_counter() - start_time) * 1000:.1f} ms.")
+
+def watch_banlists(interval=0.1, debounce=0.2):
+    """
+    Watch the source lists of WATCHED_OUTPUTS and regenerate the derived lists whenever
+    one of them is saved, until interrupted with Ctrl+C.
+    The files are polled every `interval` seconds with os.stat, and a change is only
+    picked up once the file has stayed unchanged for `debounce` seconds, so editors that
+    save in several writes trigger a single regeneration.
+    The lists used by generate_worlds and generate_tcg_traditional_list are updated to
+    the last versions seen when watching stops.
+    """
+    global tcg_current_list, ocg_current_list
+    source_files = sorted({file_name for files in WATCHED_OUTPUTS.values() for file_name in files})
+    sources = {}
+    states = {file_name: get_file_state(file_name) for file_name in source_files}
+    regenerate_derived_lists(source_files, sources)
+
+    print(f"Watching {', '.join(source_files)} for changes. Press Ctrl+C to stop.")
+    pending = {}  # file name -> time of its last change
+    try:
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            for file_name in source_files:
+                state = get_file_state(file_name)
+                if state != states[file_name]:
+                    states[file_name] = state
+                    pending[file_name] = now
+            ready = [file_name for file_name, changed_at in pending.items() if now - changed_at >= debounce]
+            if ready:
+                for file_name in ready:
+                    del pending[file_name]
+                regenerate_derived_lists(ready, sources)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        tcg_current_list = sources.get("0TCG.lflist.conf")
+        ocg_current_list = sources.get("OCG.lflist.conf")
+
+@timed("banlist.diff")
+def diff_banlists(old, new):
+    """
+    Compare two banlists and return {section: [(card_id, name, old_count, new_count)]}
+    with the cards whose count changed, grouped by DIFF_SECTIONS. Unlisted cards count as 3.
+    """
+    changes = {section: [] for section in DIFF_SECTIONS.values()}
+    unlisted = BanlistEntry(3, "")
 
-    # Step 3: Sort the lines, first by count, then by card name
-    card_pattern = re.compile(r"(\d+)\s+(\d+)\s+--\s*(.*)")
-    sorted_list = []
+    for card_id in old.entries.keys() | new.entries.keys():
+        old_entry = old.entries.get(card_id, unlisted)
+        new_entry = new.entries.get(card_id, unlisted)
+        if old_entry.limit != new_entry.limit:
+            name = new_entry.name or old_entry.name
+            changes[DIFF_SECTIONS[min(new_entry.limit, 3)]].append((card_id, name, old_entry.limit, new_entry.limit))
 
-    for line in traditional_list:
-        match = card_pattern.match(line.strip())
-        if match:
-            count = int(match.group(2))
-            card_name = match.group(3)
-            sorted_list.append((count, card_name, line))
-        else:
-            sorted_list.append((float('inf'), line.strip(), line))  # Non-card lines placed at the end
-
-    # Sorting by count and then by card name
-    sorted_list.sort(key=lambda x: (x[0], x[1]))
-
-    # Step 4: Remove lines that start with "#" or "!"
-    sorted_list = [line for _, _, line in sorted_list if not line.strip().startswith(("#", "!"))]
-
-    # Step 5: Get the identifier from tcg_current_list (the first 2 lines)
-    first_line = tcg_current_list[0].strip()
-    second_line = tcg_current_list[1].strip()
-
-    # Step 6: Prepare to write the output file with the identifier lines
-    first_line = re.sub(r"(TCG|OCG)", "Traditional", first_line)  # Change identifier to "Worlds"
-    second_line = re.sub(r"(TCG|OCG)", "Traditional", second_line)  # Same for the second line
-
-    # Prepare the first two lines with the identifier changed to "Worlds"
-    with open("Traditional.new.lflist.conf", "w") as file:
-        file.write(f"{first_line}\n")
-        file.write(f"{second_line}\n")
-
-        # Step 7: Add a line before the first count 1 with "#Limited" and the count 2 with "#Semi-Limited"
-        added_limited = False
-        added_semi_limited = False
-        for line in sorted_list:
-            if re.match(r"^\d+\s+1\s+--", line.strip()) and not added_limited:
-                file.write("#Limited\n")
-                added_limited = True
-            if re.match(r"^\d+\s+2\s+--", line.strip()) and not added_semi_limited:
-                file.write("#Semi-Limited\n")
-                added_semi_limited = True
-            file.write(f"{line}\n")
-    # Step 8: Remove any extra empty lines from the output file
-    with open("Traditional.new.lflist.conf", "r") as file:
-        lines = file.readlines()
-
-    # Remove empty lines (lines that contain only whitespace)
-    lines = [line for line in lines if line.strip()]
-
-    # Write the cleaned lines back to the file
-    with open("Traditional.new.lflist.conf", "w") as file:
-        file.writelines(lines)
-    print("Traditional.new.lflist.conf has been generated, count adjusted, sorted, and commented.\n\n")
+    for cards in changes.values():
+        cards.sort(key=lambda card: card[1])
+    return changes
 
+def get_banlist_label(banlist, file_name):
+    return banlist.name[1:].strip() if banlist.name else os.path.basename(file_name)
 
+def sort_by_date(file_names, banlists):
+    """
+    Sort lflist files and their loaded banlists by the date in the title, then by file name.
+    Returns the sorted (file_names, banlists).
+    """
+    def date_key(item):
+        file_name, banlist = item
+        match = TITLE_PATTERN.match(banlist.title) if banlist else None
+        return (match.group(1) if match else "", file_name)
+    pairs = sorted(zip(file_names, banlists), key=date_key)
+    return [file_name for file_name, _ in pairs], [banlist for _, banlist in pairs]
+
+def format_banlist_diffs(diffs, output_format="text"):
+    """
+    Format a list of (old_label, new_label, changes) tuples as a text, JSON or Markdown changelog.
+    """
+    if output_format == "json":
+        return json.dumps([
+            {
+                "from": old_label,
+                "to": new_label,
+                "changes": {
+                    section: [{"id": card_id, "name": name, "from": old_count, "to": new_count}
+                              for card_id, name, old_count, new_count in cards]
+                    for section, cards in changes.items()
+                },
+            }
+            for old_label, new_label, changes in diffs
+        ], indent=2) + "\n"
+
+    lines = []
+    for old_label, new_label, changes in diffs:
+        if output_format == "markdown":
+            lines.append(f"## {old_label} -> {new_label}\n")
+        else:
+            lines.append(f"{old_label} -> {new_label}")
+        for section, cards in changes.items():
+            if not cards:
+                continue
+            if output_format == "markdown":
+                lines.append(f"### {section}\n")
+                lines.extend(f"- {name} ({card_id}): {old_count} -> {new_count}" for card_id, name, old_count, new_count in cards)
+            else:
+                lines.append(f"  {section}:")
+                lines.extend(f"    {card_id} {name} ({old_count} -> {new_count})" for card_id, name, old_count, new_count in cards)
+            lines.append("")
+        if not any(changes.values()):
+            lines.append("No changes.\n")
+    return "\n".join(lines)
+
+def generate_changelog(file_names, output_format="text", output_file=None, banlists=None):
+    """
+    Diff each lflist file against the previous one and print or write the changelog.
+    The files are loaded with load_banlists unless their banlists are given.
+    Returns False if any of the files could not be loaded.
+    """
+    if banlists is None:
+        banlists = load_banlists(file_names)
+    if not all(banlists):
+        return False
+
+    diffs = []
+    for (old_name, old), (new_name, new) in zip(zip(file_names, banlists), zip(file_names[1:], banlists[1:])):
+        diffs.append((get_banlist_label(old, old_name), get_banlist_label(new, new_name), diff_banlists(old, new)))
+
+    changelog = format_banlist_diffs(diffs, output_format)
+    if output_file:
+        write_file_atomic(output_file, changelog)
+        print(f"Changelog for {len(diffs)} list updates written to {output_file}.")
+    else:
+        print(changelog)
+    return True
+
+def validate_banlist(banlist, card_names):
+    """
+    Check the entries of a banlist against {id: name} from the card database.
+    Returns (renamed, unknown): a list of (card_id, listed_name, database_name) for wrong
+    names and a sorted list of card IDs missing from the database.
+    """
+    renamed = []
+    unknown = []
+    for card_id, entry in banlist.entries.items():
+        database_name = card_names.get(card_id)
+        if database_name is None:
+            unknown.append(card_id)
+        elif database_name != entry.name:
+            renamed.append((card_id, entry.name, database_name))
+    renamed.sort()
+    unknown.sort()
+    return renamed, unknown
+
+def fix_lflist_names(file_name, card_names):
+    """
+    Rewrite the names of the card lines of an lflist file whose name differs from {id: name}
+    from the card database. Only the text after "--" changes; every other line, comment and
+    the order of the file are kept as they are. Returns the number of lines fixed.
+    """
+    lines = read_file(file_name)
+    fixed = 0
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        match = CARD_PATTERN.match(stripped)
+        if not match:
+            continue
+        database_name = card_names.get(int(match.group(1)))
+        if database_name is None or database_name == match.group(3):
+            continue
+        start = len(line) - len(line.lstrip()) + match.start(3)
+        lines[index] = line[:start] + database_name + line[start + len(match.group(3)):]
+        fixed += 1
+    if fixed:
+        write_file_atomic(file_name, "".join(lines))
+    return fixed
+
+def validate_lflists(file_names, database_paths, fix=False):
+    """
+    Validate lflist files against one or more card databases (later databases take
+    priority). All referenced IDs are read in one batched query per database.
+    With fix=True, the wrong names are replaced with the database names in place.
+    Returns (wrong_names, unknown_ids): the totals found across all the lists.
+    """
+    from fix_card_name_coments import get_card_names_for_ids
+
+    banlists = {file_name: load_banlist(file_name) for file_name in file_names}
+    banlists = {file_name: banlist for file_name, banlist in banlists.items() if banlist}
+    card_ids = set()
+    for banlist in banlists.values():
+        card_ids.update(banlist.entries)
+    with span("banlist.database_lookup"):
+        card_names = get_card_names_for_ids(database_paths, card_ids)
+
+    total_renamed = total_unknown = 0
+    for file_name, banlist in banlists.items():
+        renamed, unknown = validate_banlist(banlist, card_names)
+        total_renamed += len(renamed)
+        total_unknown += len(unknown)
+        for card_id, listed_name, database_name in renamed:
+            print(f"{file_name}: {card_id} is listed as '{listed_name}' but named '{database_name}' in the database.")
+        for card_id in unknown:
+            print(f"{file_name}: {card_id} ({banlist.entries[card_id].name}) not found in the database.")
+        if fix and renamed:
+            fixed = fix_lflist_names(file_name, card_names)
+            print(f"{file_name}: {fixed} names fixed.")
+
+    print(f"Validated {len(banlists)} lists: {total_renamed} wrong names, {total_unknown} unknown card IDs.")
+    return total_renamed, total_unknown
+
+def option_validate():
+    print("Option 3: Validate lists against the card database is executed!")
+    database_paths = input("Enter the path(s) to the .cdb files, in priority order (separated by ';'): ").strip()
+    database_paths = [path.strip() for path in database_paths.split(";") if path.strip()]
+
+    for database_path in database_paths:
+        if not os.path.isfile(database_path):
+            print(f"Database file not found: {database_path}")
+            return
+    if not database_paths:
+        print("No database given.")
+        return
+
+    fix = input("Fix wrong names in the lists? (y/N): ").strip().lower() == "y"
+    file_names = sorted(name for name in os.listdir(".") if name.endswith(".lflist.conf"))
+    validate_lflists(file_names, database_paths, fix)
 
 def main():
     load_files()  # Load the files before the user selects an option
@@ -248,23 +617,26 @@ def main():
         print("\nSelect an option:")
         print("1. Generate Worlds Forbidden/Limited list")
         print("2. Generate TCG Traditional list")
-        print("3. feature to be implemented (not in use for now)")
-        print("4. Exit")
+        print("3. Validate lists against the card database")
+        print("4. Watch the TCG/OCG lists and regenerate options 1 and 2 on every save")
+        print("5. Exit")
 
         try:
-            choice = int(input("Enter your choice (1/2/3/4): "))
+            choice = int(input("Enter your choice (1/2/3/4/5): "))
 
             if choice == 1:
                 generate_worlds()
-            if choice == 2:
+            elif choice == 2:
                 generate_tcg_traditional_list()
             elif choice == 3:
-                print("This option is not in use currently.")
+                option_validate()
             elif choice == 4:
+                watch_banlists()
+            elif choice == 5:
                 print("Exiting the script.")
                 break
             else:
-                print("Invalid choice. Please choose a number between 1 and 4.")
+                print("Invalid choice. Please choose a number between 1 and 5.")
         except ValueError:
             print("Invalid input. Please enter a valid number.")
 
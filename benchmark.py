@@ -0,0 +1,293 @@
+"""
+Benchmarks for the scripts in this repository, run on synthetic data.
+
+Each benchmark generates realistic inputs (lflist files, a card database, a scripts
+folder, a pics folder and a Bastion.xlsx-shaped workbook) in a temporary folder and
+times the scripts' functions at several sizes. Results are written as JSON so runs
+from different commits can be compared:
+
+    python benchmark.py --sizes 1000,10000 --output before.json
+    python benchmark.py --sizes 1000,10000 --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ["Dragon", "Blue-Eyes", "Magician", "Dark", "Ash", "Blossom", "Joyous", "Spring", "Knight", "Sky",
+         "Striker", "Maxx", "Nibiru", "Primal", "Being", "Infinite", "Impermanence", "Ghost", "Ogre", "Snow",
+         "Rabbit", "Called", "By", "The", "Grave", "Crossout", "Designator", "Pot", "Of", "Greed"]
+
+def make_card_ids(count, seed=0):
+    rng = random.Random(seed)
+    return rng.sample(range(10000000, 99999999), count)
+
+def make_card_name(card_id):
+    rng = random.Random(card_id)
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+
+def make_lflist(path, card_ids, label, date, seed=0):
+    """Write a .lflist.conf with the given cards spread over the forbidden/limited/semi-limited/unlimited groups."""
+    rng = random.Random(seed)
+    groups = {limit: [] for limit in range(4)}
+    for card_id in card_ids:
+        groups[rng.choice(range(4))].append(card_id)
+
+    lines = [f"#[{date} {label}]\n", f"!{date} {label}\n", "$whitelist\n"]
+    for limit, header in enumerate(["#Forbidden", "#Limited", "#Semi-Limited", "#Unlimited"]):
+        lines.append(f"{header}\n")
+        lines.extend(f"{card_id} {limit} --{make_card_name(card_id)}\n" for card_id in groups[limit])
+    with open(path, "w") as file:
+        file.writelines(lines)
+
+# Card types for the datas table: effect monster, spell, trap, Normal monster, Normal Pendulum monster
+CARD_TYPES = [0x21, 0x21, 0x21, 0x2, 0x4, 0x11, 0x1000011]
+
+def make_cdb(path, card_ids):
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE texts (id INTEGER PRIMARY KEY, name TEXT, desc TEXT)")
+        conn.execute("CREATE TABLE datas (id INTEGER PRIMARY KEY, type INTEGER)")
+        conn.executemany("INSERT INTO texts VALUES (?, ?, ?)",
+                         ((card_id, make_card_name(card_id), "Effect text. " * 20) for card_id in card_ids))
+        conn.executemany("INSERT INTO datas VALUES (?, ?)",
+                         ((card_id, CARD_TYPES[card_id % len(CARD_TYPES)]) for card_id in card_ids))
+        conn.commit()
+
+def make_scripts(folder, card_ids, seed=0):
+    """Write c<id>.lua scripts; about a third have a stale name or a comment with a space after "--"."""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for card_id in card_ids:
+        name = make_card_name(card_id) if rng.random() < 0.66 else "Old Name"
+        comment = "-- " if rng.random() < 0.33 else "--"
+        with open(os.path.join(folder, f"c{card_id}.lua"), "w", encoding="utf-8") as file:
+            file.write(f"--カード\n--{name}\n--Scripted by Someone\nlocal s,id=GetID()\nfunction s.initial_effect(c)\n"
+                       f"\t{comment}Activate\n\tlocal e1=Effect.CreateEffect(c)\n\te1:SetType(EFFECT_TYPE_ACTIVATE)\n"
+                       "\tc:RegisterEffect(e1)\nend\n")
+
+def make_png(width, height):
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+    rows = b"".join(b"\x00" + b"\x80" * width * 3 for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+def make_jpg(width, height):
+    """A JPEG header (JFIF segment and baseline start-of-frame) followed by filler scan data."""
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xda" + b"\x00" * 4096 + b"\xff\xd9"
+
+def make_pics(folder, card_ids, seed=0):
+    """Write a pics folder: mostly 400x580 pics, some low resolution ones and some PNG/JPG duplicates."""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    pics = {"png": make_png(400, 580), "jpg": make_jpg(400, 580)}
+    low_res = {"png": make_png(177, 254), "jpg": make_jpg(177, 254)}
+    for card_id in card_ids:
+        extension = rng.choice(["png", "jpg"])
+        data = low_res[extension] if rng.random() < 0.1 else pics[extension]
+        with open(os.path.join(folder, f"{card_id}.{extension}"), "wb") as file:
+            file.write(data)
+        if rng.random() < 0.05:
+            with open(os.path.join(folder, f"{card_id}.jpg"), "wb") as file:
+                file.write(pics["jpg"])
+
+def sheet_xml(rows):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>']
+    for row_number, row in enumerate(rows, 1):
+        out.append(f'<row r="{row_number}">')
+        for column, value in enumerate(row):
+            if value is not None:
+                out.append(f'<c r="{chr(65 + column)}{row_number}" t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+        out.append("</row>")
+    out.append("</sheetData></worksheet>")
+    return "".join(out)
+
+def make_workbook(path, function_count, constant_count, seed=0):
+    """Write a workbook with the Functions, Constants and Archetype constants sheets of Bastion.xlsx."""
+    rng = random.Random(seed)
+    namespaces = ["Card", "Duel", "Effect", "Group", "Debug", "aux"]
+    types = ["int", "bool", "Card", "Group", "Effect", "void", "string"]
+    descriptions = [" ".join(rng.choice(WORDS).lower() for _ in range(rng.randint(5, 80))) for _ in range(max(1, function_count // 4))]
+    functions = [["Functions"], ["Return", "Function", "Description"]]
+    for index in range(function_count):
+        params = ", ".join(f"{rng.choice(types)} p{param}" for param in range(rng.randint(0, 5)))
+        functions.append([rng.choice(types), f"{rng.choice(namespaces)}.Function{index}({params})", rng.choice(descriptions)])
+    constants = [["Constants"], ["Value", "Name"]] + [[str(index), f"CONSTANT_{index}"] for index in range(constant_count)]
+    archetypes = [["Archetype constants"], ["Name"]] + [[f"SET_ARCHETYPE_{index}"] for index in range(constant_count // 4)]
+
+    sheets = {"Functions": functions, "Constants": constants, "Archetype constants": archetypes}
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("xl/workbook.xml",
+                          '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                          'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+                          + "".join(f'<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>' for index, name in enumerate(sheets, 1))
+                          + "</sheets></workbook>")
+        workbook.writestr("xl/_rels/workbook.xml.rels",
+                          '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                          + "".join(f'<Relationship Id="rId{index}" Target="worksheets/sheet{index}.xml"/>' for index in range(1, len(sheets) + 1))
+                          + "</Relationships>")
+        for index, rows in enumerate(sheets.values(), 1):
+            workbook.writestr(f"xl/worksheets/sheet{index}.xml", sheet_xml(rows))
+
+def bench_banlists(size, repeats):
+    import banlist_management
+    make_lflist("0TCG.lflist.conf", make_card_ids(size, 1), "TCG", "2024.09", 1)
+    make_lflist("OCG.lflist.conf", make_card_ids(size, 2)[:size // 2] + make_card_ids(size, 1)[:size // 2], "OCG", "2024.10", 2)
+    banlist_management.load_files()
+    yield "generate_worlds", time_calls(banlist_management.generate_worlds, repeats)
+    yield "generate_tcg_traditional_list", time_calls(banlist_management.generate_tcg_traditional_list, repeats)
+
+def bench_scripts(size, repeats):
+    import fix_card_name_coments
+    card_ids = make_card_ids(size, 3)
+    make_cdb("cards.delta.cdb", card_ids)
+    yield "get_database_card_names", time_calls(lambda: fix_card_name_coments.get_database_card_names("cards.delta.cdb"), repeats)
+
+    card_names = fix_card_name_coments.get_database_card_names("cards.delta.cdb")
+    setup = lambda: (shutil.rmtree("script", ignore_errors=True), make_scripts("script", card_ids, 3))
+    yield "update_script_files", time_calls(lambda: fix_card_name_coments.update_script_files("script", card_names), repeats, setup)
+
+def bench_pics(size, repeats):
+    import picture_management
+    card_ids = make_card_ids(size, 4)
+    setup = lambda: (shutil.rmtree("pics", ignore_errors=True), make_pics("pics", card_ids, 4))
+    yield "option_one", time_calls(picture_management.option_one, repeats, setup)
+
+    clear_cache = lambda: os.path.exists(picture_management.CACHE_FILE) and os.remove(picture_management.CACHE_FILE)
+    yield "option_two", time_calls(picture_management.option_two, repeats, clear_cache)
+    yield "option_two (cached)", time_calls(picture_management.option_two, repeats)
+
+def bench_autocomplete(size, repeats):
+    import generate_auto_completion_for_npp
+    make_workbook("Bastion.xlsx", size, size)
+    yield "read_api_model", time_calls(lambda: generate_auto_completion_for_npp.read_api_model("Bastion.xlsx"), repeats)
+
+    model = generate_auto_completion_for_npp.read_api_model("Bastion.xlsx")
+    functions = [(function.name, function.return_type, [param.text for param in function.params], function.description)
+                 for function in model.functions]
+    # Clear the description cache so every run wraps the descriptions again
+    run = lambda: (generate_auto_completion_for_npp.format_description.cache_clear(),
+                   generate_auto_completion_for_npp.generate_autocomplete_xml(functions, model.constants))
+    yield "generate_autocomplete_xml", time_calls(run, repeats)
+
+def bench_consistency(size, repeats):
+    import consistency_check
+    card_ids = make_card_ids(size, 5)
+    make_cdb("cards.cdb", card_ids[:size * 9 // 10])
+    make_lflist("0TCG.lflist.conf", card_ids[::20], "TCG", "2024.09", 5)
+    # Only the file names matter here, so empty files stand in for the pics and scripts
+    for folder, pattern, selected in (("pics", "{}.jpg", card_ids[:size * 8 // 10]), ("script", "c{}.lua", card_ids[size // 10:])):
+        os.makedirs(folder, exist_ok=True)
+        for card_id in selected:
+            open(os.path.join(folder, pattern.format(card_id)), "w").close()
+
+    def run():
+        index = consistency_check.build_card_index("pics", "script", ["cards.cdb"], ["0TCG.lflist.conf"])
+        consistency_check.write_report(consistency_check.check_consistency(index))
+    yield "consistency_check", time_calls(run, repeats)
+
+BENCHMARKS = {
+    "banlists": bench_banlists,
+    "scripts": bench_scripts,
+    "pics": bench_pics,
+    "autocomplete": bench_autocomplete,
+    "consistency": bench_consistency,
+}
+
+def time_calls(function, repeats, setup=None):
+    """Time a function, running setup (untimed) before each call. Returns the timings in seconds."""
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def get_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(names, sizes, repeats):
+    results = []
+    original_dir = os.getcwd()
+    for name in names:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as work_dir:
+                os.chdir(work_dir)
+                try:
+                    # The scripts print progress for every step; keep the benchmark output readable
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        timings = list(BENCHMARKS[name](size, repeats))
+                finally:
+                    os.chdir(original_dir)
+            for benchmark, seconds in timings:
+                result = {"group": name, "benchmark": benchmark, "size": size, "min": min(seconds),
+                          "mean": statistics.mean(seconds), "repeats": len(seconds)}
+                results.append(result)
+                print(f"{benchmark:<32} {size:>8} {result['min']:>10.4f}s {result['mean']:>10.4f}s")
+    return results
+
+def compare_results(results, previous):
+    """Print the ratio of each result to the matching one of a previous run."""
+    previous = {(result["benchmark"], result["size"]): result["min"] for result in previous["results"]}
+    print(f"\n{'benchmark':<32} {'size':>8} {'before':>10} {'after':>10} {'ratio':>8}")
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before:
+            print(f"{result['benchmark']:<32} {result['size']:>8} {before:>10.4f} {result['min']:>10.4f} {result['min'] / before:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scripts on synthetic data.")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma separated input sizes (default: 1000,10000)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per benchmark (default: 3)")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="Benchmark group to run (repeatable, default: all)")
+    parser.add_argument("--output", help="File to write the JSON results to")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"{'benchmark':<32} {'size':>8} {'min':>11} {'mean':>11}")
+    results = run_benchmarks(args.only or list(BENCHMARKS), sizes, args.repeats)
+
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults written to {args.output}.")
+    if args.compare:
+        with open(args.compare) as file:
+            compare_results(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Non-interactive entry point for the scripts in this repository.
+
+Several commands can be chained in one invocation, and data parsed by one
+command (banlists, card databases) is reused by the following ones:
+
+    python cli.py banlist worlds banlist traditional
+    python cli.py banlist watch
+    python cli.py banlist merge -i 0TCG.lflist.conf -i OCG.lflist.conf -o Asia.lflist.conf --label Asia --policy max
+    python cli.py banlist diff --history history --format markdown -o CHANGELOG.md
+    python cli.py pics check-dims --workers 16 pics dedup --action hardlink
+    python cli.py scripts fix-names --database cards.cdb --database cards.delta.cdb --scripts script
+    python cli.py scripts fix-names --database cards.delta.cdb --scripts script --git --renamed
+    python cli.py scripts fix-names --database cards.delta.cdb --scripts script --rules all --check
+    python cli.py api export --workbook Bastion.xlsx --format vscode --format luals
+    python cli.py report consistency --database cards.cdb --pics pics --scripts script --lflist lflists
+
+Modules are only imported when one of their commands runs, so Pillow is never
+loaded by banlist or scripts commands.
+
+--profile (before the first command) prints the time spent in each stage and the
+work counters at exit; the menu scripts do the same with PYSCRIPTS_PROFILE=1.
+"""
+import argparse
+import os
+import sys
+
+# A new chained command starts at each of these words
+COMMAND_GROUPS = ("banlist", "pics", "scripts", "api", "report")
+
+def run_banlist_worlds(args, context):
+    banlist_management = load_banlists(context)
+    return banlist_management.generate_worlds()
+
+def run_banlist_traditional(args, context):
+    banlist_management = load_banlists(context)
+    return banlist_management.generate_tcg_traditional_list()
+
+def run_banlist_watch(args, context):
+    import banlist_management
+    banlist_management.watch_banlists(args.interval, args.debounce)
+
+def run_banlist_merge(args, context):
+    import banlist_management
+    if not banlist_management.generate_merged_list(args.inputs, args.output, args.label, args.policy):
+        print(f"{args.output} was not generated.")
+        return False
+
+def run_banlist_diff(args, context):
+    import banlist_management
+    inputs = list(args.inputs or [])
+    history = []
+    if args.history:
+        history = [os.path.join(args.history, name) for name in os.listdir(args.history) if name.endswith(".lflist.conf")]
+    file_names = inputs + history
+    banlists = banlist_management.load_banlists(file_names, args.snapshot)
+    if history:
+        # The history is diffed in date order after the inputs
+        history, history_banlists = banlist_management.sort_by_date(history, banlists[len(inputs):])
+        file_names = inputs + history
+        banlists = banlists[:len(inputs)] + history_banlists
+    if len(file_names) < 2:
+        print("At least two lflist files are needed for a diff.")
+        return False
+    return banlist_management.generate_changelog(file_names, args.format, args.output, banlists)
+
+def run_banlist_validate(args, context):
+    import banlist_management
+    for database_path in args.databases:
+        if not os.path.isfile(database_path):
+            print(f"Database file not found: {database_path}")
+            return False
+    file_names = args.inputs or sorted(name for name in os.listdir(".") if name.endswith(".lflist.conf"))
+    wrong_names, unknown_ids = banlist_management.validate_lflists(file_names, args.databases, args.fix)
+    # Unknown IDs, and wrong names left unfixed, fail the run so a nightly check can catch them
+    return not unknown_ids and (args.fix or not wrong_names)
+
+def load_banlists(context):
+    """Load the banlist files once per process."""
+    import banlist_management
+    if not context.get("banlists_loaded"):
+        banlist_management.load_files()
+        context["banlists_loaded"] = True
+    return banlist_management
+
+def run_pics_remove_jpg(args, context):
+    import picture_management
+    return picture_management.option_one()
+
+def run_pics_check_dims(args, context):
+    import picture_management
+    return picture_management.option_two(args.workers)
+
+def run_pics_dedup(args, context):
+    import picture_management
+    return picture_management.option_three(args.action, args.perceptual, args.workers)
+
+def run_pics_normalize(args, context):
+    import picture_management
+    return picture_management.option_four(args.dry_run, args.workers)
+
+def run_scripts_fix_names(args, context):
+    import fix_card_name_coments
+
+    for database_path in args.databases:
+        if not os.path.isfile(database_path):
+            print(f"Database file not found: {database_path}")
+            return False
+    if not os.path.isdir(args.scripts):
+        print(f"Scripts directory not found: {args.scripts}")
+        return False
+
+    rules = fix_card_name_coments.LINT_RULES if args.rules == "all" else tuple(args.rules.split(","))
+    unknown_rules = set(rules) - set(fix_card_name_coments.LINT_RULES)
+    if unknown_rules:
+        print(f"Unknown rules: {', '.join(sorted(unknown_rules))}. Available rules: {', '.join(fix_card_name_coments.LINT_RULES)}")
+        return False
+
+    card_names = load_card_names(args.databases, args.snapshot, context)
+    if not card_names:
+        print("No card names were retrieved from the database. Exiting.")
+        return False
+
+    file_names = None
+    if args.git or args.manifest or args.stdin or args.renamed:
+        file_names = set()
+        if args.git:
+            changed = fix_card_name_coments.get_git_changed_scripts(args.scripts, args.git)
+            if changed is None:
+                return False
+            file_names |= changed
+        if args.manifest:
+            changed, mtimes = fix_card_name_coments.get_modified_scripts(args.scripts, args.manifest)
+            file_names |= changed
+        if args.stdin:
+            file_names |= {line.strip() for line in sys.stdin if line.strip()}
+        if args.renamed:
+            old_card_names = fix_card_name_coments.read_rename_baseline(args.databases, args.baseline)
+            if old_card_names is None:
+                print(f"No rename baseline for these databases in {args.baseline} yet; it is recorded by this run.")
+            else:
+                file_names |= fix_card_name_coments.get_renamed_card_scripts(old_card_names, card_names)
+        print(f"{len(file_names)} changed scripts to process.")
+
+    print("Checking script files..." if args.check else "Updating script files...")
+    summary = fix_card_name_coments.update_script_files(args.scripts, card_names, args.workers, args.check, file_names, rules)
+    if args.manifest and not args.check:
+        fix_card_name_coments.save_manifest(args.scripts, mtimes, summary["updated"], args.manifest)
+    # The baseline only advances once the renamed cards' scripts have been fixed
+    if args.renamed and not args.check and not summary["errors"]:
+        fix_card_name_coments.save_rename_baseline(args.databases, card_names, args.baseline)
+    print("Finished checking scripts." if args.check else "Finished updating scripts.")
+    # In check mode, scripts that need changes fail the run so CI can catch them
+    return not (args.check and summary["updated"]) and not summary["errors"]
+
+def load_card_names(database_paths, snapshot_path, context):
+    """Read the card names of a set of databases once per process."""
+    import fix_card_name_coments
+    databases = context.setdefault("card_names", {})
+    key = tuple(os.path.abspath(path) for path in database_paths)
+    if key not in databases:
+        print("Reading card names from the database...")
+        databases[key] = fix_card_name_coments.load_card_names(database_paths, snapshot_path)
+    return databases[key]
+
+def run_api_export(args, context):
+    import generate_auto_completion_for_npp
+    if not os.path.isfile(args.workbook):
+        print(f"Workbook not found: {args.workbook}")
+        return False
+    generate_auto_completion_for_npp.export_api(args.workbook, args.formats or list(generate_auto_completion_for_npp.EXPORTERS), args.output_dir)
+
+def run_report_consistency(args, context):
+    import consistency_check
+    for database_path in args.databases:
+        if not os.path.isfile(database_path):
+            print(f"Database file not found: {database_path}")
+            return False
+    for directory in (args.pics, args.scripts, args.lflist):
+        if not os.path.isdir(directory):
+            print(f"Directory not found: {directory}")
+            return False
+
+    lflist_files = sorted(os.path.join(args.lflist, name) for name in os.listdir(args.lflist) if name.endswith(".lflist.conf"))
+    index = consistency_check.build_card_index(args.pics, args.scripts, args.databases, lflist_files, args.snapshot,
+                                               not args.include_normal)
+    if index is None:
+        print("The card databases could not be read.")
+        return False
+    report = consistency_check.check_consistency(index)
+    consistency_check.write_report(report, args.output)
+    consistency_check.print_report_summary(report)
+    print(f"Consistency check completed. Results written to '{args.output}'.")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Run edopro utility scripts without the interactive menus. Commands can be chained.",
+        parents=[build_global_parser()],
+    )
+    groups = parser.add_subparsers(dest="group", metavar="{" + ",".join(COMMAND_GROUPS) + "}", required=True)
+
+    banlist = groups.add_parser("banlist", help="Generate derived banlists (run from the lflist folder)")
+    banlist_commands = banlist.add_subparsers(dest="command", required=True)
+    banlist_commands.add_parser("worlds", help="Generate World.new.lflist.conf").set_defaults(handler=run_banlist_worlds)
+    banlist_commands.add_parser("traditional", help="Generate Traditional.new.lflist.conf").set_defaults(handler=run_banlist_traditional)
+
+    watch = banlist_commands.add_parser("watch", help="Regenerate the World and Traditional lists whenever the TCG/OCG lists are saved")
+    watch.add_argument("--interval", type=float, default=0.1, help="Seconds between checks of the source files (default: 0.1)")
+    watch.add_argument("--debounce", type=float, default=0.2,
+                       help="Seconds a changed file must stay unchanged before regenerating (default: 0.2)")
+    watch.set_defaults(handler=run_banlist_watch)
+
+    merge = banlist_commands.add_parser("merge", help="Merge any number of lflist files into a new list")
+    merge.add_argument("-i", "--input", dest="inputs", action="append", required=True,
+                       help="lflist file to merge, in order of preference (repeatable)")
+    merge.add_argument("-o", "--output", required=True, help="File to write the merged list to")
+    merge.add_argument("--label", required=True, help="Identifier used in the title of the merged list")
+    merge.add_argument("--policy", choices=["min", "max", "prefer-source"], default="min",
+                       help="How to resolve cards listed with different counts (default: min)")
+    merge.set_defaults(handler=run_banlist_merge)
+
+    diff = banlist_commands.add_parser("diff", help="Report the changes between lflist versions")
+    diff.add_argument("-i", "--input", dest="inputs", action="append",
+                      help="lflist file, from oldest to newest (repeatable)")
+    diff.add_argument("--history", help="Folder of past lflist files, diffed in date order after the inputs")
+    diff.add_argument("--format", choices=["text", "json", "markdown"], default="text", help="Output format (default: text)")
+    diff.add_argument("-o", "--output", help="File to write the changelog to (default: print it)")
+    diff.add_argument("--snapshot", default="lflists.snapshot.json",
+                      help="Parsed lists reused while their files are unchanged, '' to disable (default: lflists.snapshot.json)")
+    diff.set_defaults(handler=run_banlist_diff)
+
+    validate = banlist_commands.add_parser("validate", help="Check card IDs and names against the card database")
+    validate.add_argument("--database", dest="databases", action="append", required=True,
+                          help="Path to a .cdb file; later ones take priority (repeatable)")
+    validate.add_argument("-i", "--input", dest="inputs", action="append",
+                          help="lflist file to validate (repeatable, default: every *.lflist.conf here)")
+    validate.add_argument("--fix", action="store_true", help="Rewrite wrong names with the database names")
+    validate.set_defaults(handler=run_banlist_validate)
+
+    pics = groups.add_parser("pics", help="Manage the pics folder (run from its parent folder)")
+    pics_commands = pics.add_subparsers(dest="command", required=True)
+    pics_commands.add_parser("remove-jpg", help="Remove JPG pics that also exist as PNG").set_defaults(handler=run_pics_remove_jpg)
+
+    check_dims = pics_commands.add_parser("check-dims", help="List low resolution pics in pics_to_generate.ydk")
+    check_dims.add_argument("--workers", type=int, help="Number of worker threads")
+    check_dims.set_defaults(handler=run_pics_check_dims)
+
+    dedup = pics_commands.add_parser("dedup", help="Find duplicated pics by content")
+    dedup.add_argument("--action", choices=["report", "hardlink", "remove"], default="report",
+                       help="What to do with byte-identical pics (default: report)")
+    dedup.add_argument("--perceptual", action="store_true", help="Also report visually identical pics")
+    dedup.add_argument("--workers", type=int, help="Number of workers")
+    dedup.set_defaults(handler=run_pics_dedup)
+
+    normalize = pics_commands.add_parser("normalize", help="Resize and re-encode off-size pics")
+    normalize.add_argument("--dry-run", action="store_true", help="Only list the pics that would be changed")
+    normalize.add_argument("--workers", type=int, help="Number of worker processes")
+    normalize.set_defaults(handler=run_pics_normalize)
+
+    scripts = groups.add_parser("scripts", help="Maintain the Lua card scripts")
+    scripts_commands = scripts.add_subparsers(dest="command", required=True)
+    fix_names = scripts_commands.add_parser("fix-names", help="Fix card names and comment formatting in the scripts")
+    fix_names.add_argument("--database", dest="databases", action="append", required=True,
+                           help="Path to a .cdb file, from lowest to highest priority (repeatable)")
+    fix_names.add_argument("--snapshot", default="card_names.snapshot.json",
+                           help="Card name snapshot reused while the databases are unchanged, '' to disable (default: card_names.snapshot.json)")
+    fix_names.add_argument("--scripts", required=True, help="Directory containing the c<id>.lua files")
+    fix_names.add_argument("--workers", type=int, help="Number of worker threads")
+    fix_names.add_argument("--check", action="store_true", help="Only report the scripts that need changes")
+    fix_names.add_argument("--rules", default="name,comment-space",
+                           help="Comma separated lint rules, or 'all': name, scripted-by, comment-space, getid, "
+                                "trailing-whitespace, crlf (default: name,comment-space)")
+    incremental = fix_names.add_argument_group("incremental mode", "Only process the scripts selected by these options")
+    incremental.add_argument("--git", nargs="?", const="HEAD", metavar="REV",
+                             help="Scripts changed in the local git checkout since REV (default: HEAD), plus untracked ones")
+    incremental.add_argument("--manifest", nargs="?", const="scripts_manifest.json", metavar="PATH",
+                             help="Scripts modified since the last run recorded in PATH (default: scripts_manifest.json)")
+    incremental.add_argument("--stdin", action="store_true", help="Script file names read from stdin, one per line")
+    incremental.add_argument("--renamed", action="store_true",
+                             help="Scripts of the cards renamed since the last --renamed run with the same databases")
+    incremental.add_argument("--baseline", default="card_names.baseline.json",
+                             help="Card names recorded by the last --renamed run (default: card_names.baseline.json)")
+    fix_names.set_defaults(handler=run_scripts_fix_names)
+
+    api = groups.add_parser("api", help="Generate editor auto-completion files from the API workbook")
+    api_commands = api.add_subparsers(dest="command", required=True)
+    export = api_commands.add_parser("export", help="Export the API to one or more editor formats")
+    export.add_argument("--workbook", default="Bastion.xlsx", help="Path to the API workbook (default: Bastion.xlsx)")
+    export.add_argument("--format", dest="formats", action="append", choices=["notepadpp", "vscode", "luals", "sublime"],
+                        help="Format to export (repeatable, default: all)")
+    export.add_argument("--output-dir", default=".", help="Folder to write the files to (default: current folder)")
+    export.set_defaults(handler=run_api_export)
+
+    report = groups.add_parser("report", help="Cross-check pics, scripts, databases and banlists")
+    report_commands = report.add_subparsers(dest="command", required=True)
+    consistency = report_commands.add_parser("consistency",
+                                             help="List missing pics and scripts, orphan scripts and unknown banlist cards")
+    consistency.add_argument("--database", dest="databases", action="append", required=True,
+                             help="Path to a .cdb file, from lowest to highest priority (repeatable)")
+    consistency.add_argument("--snapshot", default="card_names.snapshot.json",
+                             help="Card name snapshot reused while the databases are unchanged, '' to disable (default: card_names.snapshot.json)")
+    consistency.add_argument("--pics", default="pics", help="Directory containing the <id>.png/jpg files (default: pics)")
+    consistency.add_argument("--scripts", default="script", help="Directory containing the c<id>.lua files (default: script)")
+    consistency.add_argument("--lflist", default=".", help="Directory containing the .lflist.conf files (default: current folder)")
+    consistency.add_argument("--include-normal", action="store_true",
+                             help="Also report Normal monsters and tokens without a script, which normally have none")
+    consistency.add_argument("-o", "--output", default="consistency_report.ydk",
+                             help="File to write the report to (default: consistency_report.ydk)")
+    consistency.set_defaults(handler=run_report_consistency)
+
+    return parser
+
+def build_global_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", add_help=False)
+    parser.add_argument("--profile", action="store_true", help="Print per-stage timings and counters at exit")
+    parser.add_argument("--profile-output", metavar="PATH", help="Also write the profile report as JSON to PATH")
+    parser.add_argument("--cprofile", metavar="PATH", help="Dump cProfile stats to PATH")
+    return parser
+
+def get_option_nargs(parser):
+    """Map each option string of a parser to the number of values it takes (0 for flags, "?" if optional)."""
+    return {option: 1 if action.nargs is None else action.nargs
+            for action in parser._actions for option in action.option_strings}
+
+def get_command_parsers(parser):
+    """Map each (group, command) pair to its subparser."""
+    command_parsers = {}
+    for action in parser._subparsers._group_actions:
+        for group, group_parser in action.choices.items():
+            for command_action in group_parser._subparsers._group_actions:
+                for command, command_parser in command_action.choices.items():
+                    command_parsers[group, command] = command_parser
+    return command_parsers
+
+def split_commands(parser, argv):
+    """
+    Split the argument list into the global options and one chunk per chained command.
+    A group name only starts a new command in command position, so option values that
+    happen to be group names (--pics pics, --scripts scripts) stay with their option.
+    """
+    option_nargs = {None: get_option_nargs(parser)}
+    option_nargs.update((key, get_option_nargs(command_parser)) for key, command_parser in get_command_parsers(parser).items())
+    global_args = []
+    chunks = []
+    expects_value = None  # None, or the nargs of the option waiting for its value
+    for arg in argv:
+        is_command = arg in COMMAND_GROUPS
+        if expects_value == "?" and (is_command or arg.startswith("-")):
+            expects_value = None
+        if expects_value is not None:
+            expects_value = None
+        elif is_command:
+            chunks.append([])
+        elif arg.startswith("-") and "=" not in arg:
+            current = tuple(chunks[-1][:2]) if chunks else None
+            expects_value = option_nargs.get(current, {}).get(arg) or None
+        (chunks[-1] if chunks else global_args).append(arg)
+    return global_args, chunks
+
+def parse_commands(parser, chunks):
+    """Parse one namespace per chained command."""
+    return [parser.parse_args(chunk) for chunk in chunks]
+
+def main(argv=None):
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        parser.print_help()
+        return 1
+
+    # Global options come before the first command
+    global_args, chunks = split_commands(parser, argv)
+    options, rest = build_global_parser().parse_known_args(global_args)
+    if rest:
+        # Let the full parser print the help or report the unknown option
+        parser.parse_args(argv)
+    if options.profile or options.profile_output or options.cprofile:
+        import instrumentation
+        instrumentation.enable(options.profile_output, options.cprofile)
+
+    context = {}
+    exit_code = 0
+    for args in parse_commands(parser, chunks):
+        if args.handler(args, context) is False:
+            exit_code = 1
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+
+from banlist_management import load_banlist
+from fix_card_name_coments import SNAPSHOT_FILE, is_script_file, load_card_names
+from instrumentation import count, timed
+
+OUTPUT_FILE = "consistency_report.ydk"
+PIC_EXTENSIONS = (".png", ".jpg")
+# Report sections, in the order they are written
+REPORT_SECTIONS = ("missing-pics", "missing-scripts", "orphan-scripts", "unknown-banlist-cards")
+# Card types (datas.type) that have no script: Normal monsters, except Pendulums, and tokens
+TYPE_NORMAL = 0x10
+TYPE_TOKEN = 0x4000
+TYPE_PENDULUM = 0x1000000
+
+CardIndex = namedtuple("CardIndex", ["pics", "scripts", "database", "banlists", "scriptless"])
+
+def get_pic_ids(pics_path):
+    """Returns the set of card IDs with a <id>.png or <id>.jpg file in the pics folder."""
+    # Only the names are needed, and os.listdir is much cheaper per entry than os.scandir
+    return {int(name[:-4]) for name in os.listdir(pics_path)
+            if name[-4:].lower() in PIC_EXTENSIONS and name[:-4].isdigit()}
+
+def get_script_ids(scripts_path):
+    """Returns the set of card IDs with a c<id>.lua file in the scripts folder."""
+    return {int(name[1:-4]) for name in os.listdir(scripts_path)
+            if is_script_file(name) and name[1:-4].isdigit()}
+
+def get_banlist_ids(file_names):
+    """Returns the set of card IDs listed in any of the lflist files."""
+    banlist_ids = set()
+    for file_name in file_names:
+        banlist = load_banlist(file_name)
+        if banlist is not None:
+            banlist_ids.update(banlist.entries)
+    return banlist_ids
+
+def get_scriptless_ids(database_paths):
+    """
+    Returns the set of card IDs that need no script (Normal monsters other than Pendulums, and
+    tokens) according to the datas table of the databases, or None if one cannot be read.
+    Later databases take priority.
+    """
+    card_types = {}
+    for database_path in database_paths:
+        try:
+            with closing(sqlite3.connect(database_path)) as conn:
+                card_types.update(conn.execute("SELECT id, type FROM datas"))
+        except sqlite3.Error as e:
+            print(f"Error accessing the database {database_path}: {e}")
+            return None
+    return {card_id for card_id, card_type in card_types.items()
+            if card_type & TYPE_TOKEN or (card_type & TYPE_NORMAL and not card_type & TYPE_PENDULUM)}
+
+@timed("consistency.build_index")
+def build_card_index(pics_path, scripts_path, database_paths, lflist_files, snapshot_path=SNAPSHOT_FILE,
+                     skip_scriptless=True):
+    """
+    Lists every source of card IDs once: the pics and scripts folders, the card databases
+    (through the card name snapshot) and the lflist files. With skip_scriptless, the cards
+    that need no script are read from the databases too, so they are not reported as missing one.
+    Returns None if the card databases cannot be read.
+    """
+    card_names = load_card_names(database_paths, snapshot_path)
+    scriptless = get_scriptless_ids(database_paths) if skip_scriptless else set()
+    if card_names is None or scriptless is None:
+        return None
+    index = CardIndex(
+        pics=get_pic_ids(pics_path),
+        scripts=get_script_ids(scripts_path),
+        database=set(card_names),
+        banlists=get_banlist_ids(lflist_files),
+        scriptless=scriptless,
+    )
+    for source, card_ids in index._asdict().items():
+        count(f"consistency.{source}_ids", len(card_ids))
+    return index
+
+def check_consistency(index):
+    """
+    Cross-checks a CardIndex and returns {section: sorted card IDs} for REPORT_SECTIONS:
+    database cards without a pic, database and banlist cards without a script (other than
+    the scriptless ones), scripts of cards missing from the database and banlist cards
+    missing from the database.
+    """
+    return {
+        "missing-pics": sorted(index.database - index.pics),
+        "missing-scripts": sorted((index.database | index.banlists) - index.scripts - index.scriptless),
+        "orphan-scripts": sorted(index.scripts - index.database),
+        "unknown-banlist-cards": sorted(index.banlists - index.database),
+    }
+
+def write_report(report, output_file=OUTPUT_FILE):
+    """Writes the report as a .ydk-style list of IDs, with a '#section' line before each section."""
+    with open(output_file, "w") as f:
+        for section in REPORT_SECTIONS:
+            f.write(f"#{section}\n")
+            f.writelines(f"{card_id}\n" for card_id in report[section])
+
+def print_report_summary(report):
+    print(f"Cards without a pic: {len(report['missing-pics'])}")
+    print(f"Cards without a script: {len(report['missing-scripts'])}")
+    print(f"Scripts of cards not in the database: {len(report['orphan-scripts'])}")
+    print(f"Banlist cards not in the database: {len(report['unknown-banlist-cards'])}")
+
+def main():
+    database_path = input("Enter the path to 'cards.cdb': ").strip()
+    if not os.path.isfile(database_path):
+        print(f"Database file not found: {database_path}")
+        return
+
+    pics_path = input("Enter the path to the pics directory: ").strip()
+    scripts_path = input("Enter the path to the directory containing the Lua script files: ").strip()
+    for directory in (pics_path, scripts_path):
+        if not os.path.isdir(directory):
+            print(f"Directory not found: {directory}")
+            return
+
+    lflist_files = sorted(name for name in os.listdir(".") if name.endswith(".lflist.conf"))
+    index = build_card_index(pics_path, scripts_path, [database_path], lflist_files)
+    if index is None:
+        print("The card database could not be read. Exiting.")
+        return
+    report = check_consistency(index)
+    write_report(report)
+    print_report_summary(report)
+    print(f"Consistency check completed. Results written to '{OUTPUT_FILE}'.")
+
+if __name__ == "__main__":
+    main()
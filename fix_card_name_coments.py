@@ -1,61 +1,359 @@
 import sqlite3
 import os
+import functools
+import json
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
+from instrumentation import count, timed
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+SNAPSHOT_FILE = "card_names.snapshot.json"
+MANIFEST_FILE = "scripts_manifest.json"
+# Card names of the last successful --renamed run, per set of databases
+BASELINE_FILE = "card_names.baseline.json"
+
+@timed("scripts.read_database")
 def get_database_card_names(database_path):
-    """Reads the card names from the database and returns a dictionary of {id: name}."""
+    """
+    Reads the card names from the database and returns a dictionary of {id: name},
+    or None if the database cannot be read.
+    """
     card_names = {}
     try:
-        with sqlite3.connect(database_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM texts")
-            for card_id, card_name in cursor.fetchall():
-                card_names[card_id] = card_name
+        with closing(sqlite3.connect(database_path)) as conn:
+            # Iterating the cursor streams the rows instead of materializing them with fetchall
+            card_names.update(conn.execute("SELECT id, name FROM texts"))
     except sqlite3.Error as e:
-        print(f"Error accessing the database: {e}")
+        print(f"Error accessing the database {database_path}: {e}")
+        return None
+    count("scripts.database_rows", len(card_names))
+    return card_names
+
+def get_databases_signature(database_paths):
+    """Identifies the current state of the databases by path, size and modification time."""
+    signature = []
+    for database_path in database_paths:
+        stat = os.stat(database_path)
+        signature.append([os.path.abspath(database_path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+def read_snapshot(snapshot_path=SNAPSHOT_FILE):
+    """
+    Reads a card name snapshot and returns (signature, {id: name}), or None if the file
+    is missing or unreadable.
+    """
+    if not snapshot_path or not os.path.isfile(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, "r", encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        return snapshot["signature"], {int(card_id): name for card_id, name in snapshot["card_names"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+        return None
+
+@timed("scripts.load_card_names")
+def load_card_names(database_paths, snapshot_path=SNAPSHOT_FILE):
+    """
+    Reads the card names of several databases, given from lowest to highest priority
+    (e.g. cards.cdb, then the delta and prerelease databases), and returns a dictionary of {id: name}.
+    The merged names are saved to a snapshot that is reused while no database changes size or
+    modification time, so repeated runs skip SQLite entirely. Pass snapshot_path=None to disable it.
+    Returns None if any of the databases cannot be read, so a partial merge is never used or saved.
+    """
+    signature = get_databases_signature(database_paths)
+    snapshot = read_snapshot(snapshot_path)
+    if snapshot is not None and snapshot[0] == signature:
+        count("scripts.snapshot_hits")
+        return snapshot[1]
+
+    card_names = {}
+    for database_path in database_paths:
+        database_card_names = get_database_card_names(database_path)
+        if database_card_names is None:
+            return None
+        card_names.update(database_card_names)
+
+    if snapshot_path and card_names:
+        temp_path = f"{snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"signature": signature, "card_names": card_names}, snapshot_file)
+        os.replace(temp_path, snapshot_path)
     return card_names
 
-def update_script_files(scripts_path, card_names):
-    """Updates the Lua script files with the correct card names and fixes comment formatting."""
-    updated_count = 0  # Counter for changed scripts
-
-    for file_name in os.listdir(scripts_path):
-        if file_name.startswith("c") and file_name.endswith(".lua"):
-            card_id_str = file_name[1:-4]  # Extract the card ID from the file name
-            try:
-                card_id = int(card_id_str)
-                if card_id in card_names:
-                    script_path = os.path.join(scripts_path, file_name)
-                    with open(script_path, 'r', encoding='utf-8') as script_file:
-                        lines = script_file.readlines()
-                    
-                    changed = False  # Track if the script needs to be updated
-                    
-                    # Check and fix card name in the second line
-                    if len(lines) >= 2 and lines[1].startswith("--"):
-                        current_name = lines[1][2:].strip()
-                        correct_name = card_names[card_id]
-                        if current_name != correct_name:
-                            lines[1] = f"--{correct_name}\n"
-                            changed = True
-                    
-                    # Remove spaces after "--" in all comment lines
-                    for i, line in enumerate(lines):
-                        if line.strip().startswith("-- "):  # Check for space after "--"
-                            lines[i] = line.replace("-- ", "--", 1)
-                            changed = True
-
-                    # Write changes if any were made
-                    if changed:
-                        with open(script_path, 'w', encoding='utf-8') as script_file:
-                            script_file.writelines(lines)
-                        updated_count += 1
-                        print(f"Updated {file_name}.")
-                else:
-                    print(f"Card ID {card_id} not found in the database. Skipping file.")
-            except ValueError:
-                print(f"Invalid card ID in file name {file_name}. Skipping file.")
-
-    print(f"\nTotal scripts updated: {updated_count}")
+@timed("scripts.read_database_ids")
+def get_card_names_for_ids(database_paths, card_ids, batch_size=500):
+    """
+    Reads the names of the given card IDs from one or more databases and returns a dictionary of {id: name}.
+    Later databases override earlier ones. IDs are queried in batches with IN, so only referenced rows are read.
+    """
+    card_ids = sorted(set(card_ids))
+    card_names = {}
+    for database_path in database_paths:
+        try:
+            with closing(sqlite3.connect(database_path)) as conn:
+                for start in range(0, len(card_ids), batch_size):
+                    batch = card_ids[start:start + batch_size]
+                    placeholders = ",".join("?" * len(batch))
+                    card_names.update(conn.execute(f"SELECT id, name FROM texts WHERE id IN ({placeholders})", batch))
+        except sqlite3.Error as e:
+            print(f"Error accessing the database {database_path}: {e}")
+    return card_names
+
+# Line rules: (pattern, replacement). They are combined into one regex, so every selected
+# rule is applied in a single pass over the script; earlier rules win at the same position.
+LINE_RULES = {
+    # Normalize the "--Scripted by" credit line; the separating space is only kept before an author
+    "scripted-by": (r"^[ \t]*--[ \t]*[Ss]cripted[ \t]+[Bb]y[ \t]*",
+                    lambda match: "--Scripted by " if match.string[match.end():match.end() + 1] not in ("", "\r", "\n")
+                    else "--Scripted by"),
+    # Remove the space after "--" in comment lines with text; bare "-- " lines are left alone
+    "comment-space": (r"^[ \t]*-- (?=[ \t]*\S)", lambda match: match.group().replace("-- ", "--", 1)),
+    # Normalize the spacing of the "local s,id=GetID()" boilerplate
+    "getid": (r"^local[ \t]+s[ \t]*,[ \t]*id[ \t]*=[ \t]*GetID[ \t]*\([ \t]*\)", "local s,id=GetID()"),
+    "trailing-whitespace": (r"[ \t]+(?=\r?$)", ""),
+    "crlf": (r"\r$", ""),
+}
+# "name" fixes the card name header from the database; "getid" also reports scripts without the boilerplate
+LINT_RULES = ("name",) + tuple(LINE_RULES)
+DEFAULT_RULES = ("name", "comment-space")
+GETID_PATTERN = re.compile(r"^local s,id=GetID\(\)", re.MULTILINE)
+
+@functools.lru_cache(maxsize=None)
+def compile_line_rules(rules):
+    """
+    Compiles the selected line rules into a single regex and a {group name: replacement} table.
+    Returns None when no line rule is selected.
+    """
+    alternatives = []
+    replacements = {}
+    for rule in LINE_RULES:
+        if rule not in rules:
+            continue
+        pattern, replacement = LINE_RULES[rule]
+        group = rule.replace("-", "_")
+        alternatives.append(f"(?P<{group}>{pattern})")
+        replacements[group] = replacement
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives), re.MULTILINE), replacements
+
+def lint_script_text(text, correct_name, rules=DEFAULT_RULES):
+    """
+    Applies the selected lint rules to the text of a script.
+    Returns (fixed_text, problems), where problems lists the issues that can't be fixed automatically.
+    """
+    problems = []
+
+    # Check and fix card name in the second line
+    if "name" in rules:
+        first_end = text.find("\n")
+        second_end = text.find("\n", first_end + 1) if first_end != -1 else -1
+        if first_end != -1:
+            second_end = len(text) if second_end == -1 else second_end
+            line = text[first_end + 1:second_end]
+            if line.startswith("--") and line[2:].strip() != correct_name:
+                ending = "\r" if line.endswith("\r") else ""
+                text = f"{text[:first_end + 1]}--{correct_name}{ending}{text[second_end:]}"
+
+    compiled = compile_line_rules(frozenset(rules))
+    if compiled:
+        pattern, replacements = compiled
+
+        def replace(match):
+            replacement = replacements[match.lastgroup]
+            return replacement(match) if callable(replacement) else replacement
+
+        text = pattern.sub(replace, text)
+
+    if "getid" in rules and not GETID_PATTERN.search(text):
+        problems.append("missing 'local s,id=GetID()'")
+
+    return text, problems
+
+def write_script_atomic(script_path, text):
+    """Writes a script through a temporary file that replaces it, so it is never left half written."""
+    temp_path = f"{script_path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='') as script_file:
+            script_file.write(text)
+        os.replace(temp_path, script_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def fix_script_file(script_path, correct_name, check=False, rules=DEFAULT_RULES):
+    """
+    Lints and fixes one Lua script, read in a single call with its line endings preserved.
+    Returns (needs_update, problems, error); with check=True the file is never written.
+    """
+    try:
+        with open(script_path, 'r', encoding='utf-8', newline='') as script_file:
+            text = script_file.read()
+        count("scripts.bytes_read", len(text))
+        fixed_text, problems = lint_script_text(text, correct_name, rules)
+        changed = fixed_text != text
+        if changed and not check:
+            write_script_atomic(script_path, fixed_text)
+        return changed, problems, None
+    except (OSError, UnicodeDecodeError) as e:
+        return False, [], e
+
+@timed("scripts.update_script_files")
+def update_script_files(scripts_path, card_names, workers=None, check=False, file_names=None, rules=DEFAULT_RULES):
+    """
+    Updates the Lua script files with the correct card names and fixes comment formatting,
+    or applies any other selection of LINT_RULES.
+    Files are read and patched on a thread pool; with check=True nothing is written and the
+    scripts that would change are listed instead. If file_names is given, only those scripts
+    are processed instead of the whole directory. Returns a summary dictionary.
+    """
+    summary = {"checked": 0, "updated": [], "problems": [], "not_in_database": [], "invalid_names": [], "errors": []}
+    tasks = []
+
+    if file_names is None:
+        with os.scandir(scripts_path) as entries:
+            file_names = [entry.name for entry in entries]
+    else:
+        file_names = sorted(name for name in set(map(os.path.basename, file_names))
+                            if os.path.isfile(os.path.join(scripts_path, name)))
+
+    for file_name in file_names:
+        if not is_script_file(file_name):
+            continue
+        card_id_str = file_name[1:-4]  # Extract the card ID from the file name
+        if not card_id_str.isdigit():
+            summary["invalid_names"].append(file_name)
+        elif int(card_id_str) not in card_names:
+            summary["not_in_database"].append(file_name)
+        else:
+            tasks.append((file_name, os.path.join(scripts_path, file_name), card_names[int(card_id_str)]))
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as executor:
+        results = executor.map(lambda task: fix_script_file(task[1], task[2], check, rules), tasks)
+        for (file_name, _, _), (changed, problems, error) in zip(tasks, results):
+            summary["checked"] += 1
+            if error is not None:
+                summary["errors"].append((file_name, error))
+                continue
+            if changed:
+                summary["updated"].append(file_name)
+            summary["problems"].extend((file_name, problem) for problem in problems)
+
+    count("scripts.files_scanned", len(file_names))
+    count("scripts.files_checked", summary["checked"])
+    count("scripts.files_updated", len(summary["updated"]))
+    print_update_summary(summary, check)
+    return summary
+
+def print_update_summary(summary, check=False):
+    for file_name, error in sorted(summary["errors"]):
+        print(f"Error processing {file_name}: {error}")
+    for file_name, problem in sorted(summary["problems"]):
+        print(f"{file_name}: {problem}")
+    if check:
+        for file_name in sorted(summary["updated"]):
+            print(f"Needs update: {file_name}")
+
+    action = "needing update" if check else "updated"
+    print(f"\nScripts checked: {summary['checked']}")
+    print(f"Total scripts {action}: {len(summary['updated'])}")
+    print(f"Problems to fix by hand: {len(summary['problems'])}")
+    print(f"Scripts skipped (card ID not in the database): {len(summary['not_in_database'])}")
+    print(f"Scripts skipped (invalid card ID in file name): {len(summary['invalid_names'])}")
+    print(f"Errors: {len(summary['errors'])}")
+
+def is_script_file(file_name):
+    return file_name.startswith("c") and file_name.endswith(".lua")
+
+def get_git_changed_scripts(scripts_path, since="HEAD"):
+    """
+    Lists the scripts changed in the working tree since a git revision, plus untracked scripts,
+    using the local repository only. Returns None if git fails.
+    """
+    commands = [
+        ["git", "-C", scripts_path, "diff", "--name-only", "--relative", since, "--"],
+        ["git", "-C", scripts_path, "ls-files", "--others", "--exclude-standard"],
+    ]
+    file_names = set()
+    for command in commands:
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error listing changes with git: {e}")
+            return None
+        file_names.update(path for path in result.stdout.splitlines() if is_script_file(os.path.basename(path)))
+    return file_names
+
+def scan_script_mtimes(scripts_path):
+    """Returns a dictionary of {file_name: mtime_ns} for the scripts of a directory."""
+    with os.scandir(scripts_path) as entries:
+        return {entry.name: entry.stat().st_mtime_ns for entry in entries if is_script_file(entry.name)}
+
+def get_modified_scripts(scripts_path, manifest_path=MANIFEST_FILE):
+    """
+    Compares the scripts' modification times with the manifest saved by the last run.
+    Returns (changed_file_names, current_mtimes); every script counts as changed without a manifest.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    mtimes = scan_script_mtimes(scripts_path)
+    changed = {file_name for file_name, mtime in mtimes.items() if manifest.get(file_name) != mtime}
+    return changed, mtimes
+
+def save_manifest(scripts_path, mtimes, updated_file_names, manifest_path=MANIFEST_FILE):
+    """Saves the scripts' modification times, refreshing those of the scripts that were just rewritten."""
+    for file_name in updated_file_names:
+        mtimes[file_name] = os.stat(os.path.join(scripts_path, file_name)).st_mtime_ns
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(mtimes, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+def get_database_set_key(database_paths):
+    """Identifies a set of databases, in priority order, in the rename baseline."""
+    return os.pathsep.join(os.path.abspath(database_path) for database_path in database_paths)
+
+def read_rename_baseline(database_paths, baseline_path=BASELINE_FILE):
+    """
+    Returns the {id: name} dictionary recorded by the last successful rename run with the
+    same databases, or None if there is none.
+    """
+    try:
+        with open(baseline_path, 'r', encoding='utf-8') as baseline_file:
+            baselines = json.load(baseline_file)
+        card_names = baselines[get_database_set_key(database_paths)]
+        return {int(card_id): name for card_id, name in card_names.items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def save_rename_baseline(database_paths, card_names, baseline_path=BASELINE_FILE):
+    """Records the card names as the rename baseline of a set of databases, keeping those of other sets."""
+    try:
+        with open(baseline_path, 'r', encoding='utf-8') as baseline_file:
+            baselines = json.load(baseline_file)
+        if not isinstance(baselines, dict):
+            baselines = {}
+    except (OSError, ValueError):
+        baselines = {}
+    baselines[get_database_set_key(database_paths)] = card_names
+    temp_path = f"{baseline_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(baselines, baseline_file)
+    os.replace(temp_path, baseline_path)
+
+def get_renamed_card_scripts(old_card_names, card_names):
+    """Returns the script file names of the cards whose name changed between two {id: name} dictionaries."""
+    return {f"c{card_id}.lua" for card_id, name in card_names.items()
+            if card_id in old_card_names and old_card_names[card_id] != name}
 
 def main():
     database_path = input("Enter the path to the directory containing 'cards.delta.cdb': ").strip()
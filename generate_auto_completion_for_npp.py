@@ -1,94 +1,406 @@
-import pandas as pd
 import xml.etree.ElementTree as ET
-import xml.dom.minidom as minidom
 import re
+import functools
+import hashlib
 import html
+import json
+import os
+import zipfile
+from collections import namedtuple
+
+from instrumentation import count, span, timed
+
+SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DOC_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+MODEL_CACHE_VERSION = 1
+
+SIGNATURE_PATTERN = re.compile(r"(\w+)\.(\w+)\((.*)\)")
+
+ApiParam = namedtuple("ApiParam", ["type", "name", "optional", "text"])
+ApiFunction = namedtuple("ApiFunction", ["namespace", "name", "params", "return_type", "description"])
+ApiModel = namedtuple("ApiModel", ["functions", "constants"])
 
 def parse_function_signature(signature):
-    match = re.match(r"(\w+)\.(\w+)\((.*)\)", signature)
+    match = SIGNATURE_PATTERN.match(signature)
     if match:
         namespace, func_name, params = match.groups()
         param_list = [param.strip() for param in params.split(",") if param.strip()]
         return namespace, func_name, param_list
     return None, None, []
 
-def extract_functions(file_path):
-    functions_df = pd.read_excel(file_path, sheet_name="Functions", usecols=[0, 1, 2], names=["value", "name", "desc"], skiprows=1)
+def parse_function_signatures(signatures):
+    """Parse a batch of signatures with the precompiled pattern."""
+    return list(map(parse_function_signature, signatures))
+
+class XlsxWorkbook:
+    """
+    Minimal streaming reader for .xlsx workbooks, based on zipfile and ElementTree.iterparse.
+    The archive, the sheet index and the shared strings are read once; sheet rows are then
+    streamed one at a time.
+    """
+
+    def __init__(self, file_path):
+        self.archive = zipfile.ZipFile(file_path)
+        self.sheet_paths = self._read_sheet_paths()
+        self.shared_strings = self._read_shared_strings()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.archive.close()
+
+    def _read_sheet_paths(self):
+        relationships = ET.fromstring(self.archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in relationships.iter(f"{{{PACKAGE_REL_NS}}}Relationship")}
+        workbook = ET.fromstring(self.archive.read("xl/workbook.xml"))
+
+        sheet_paths = {}
+        for sheet in workbook.iter(f"{{{SHEET_NS}}}sheet"):
+            target = targets[sheet.get(f"{{{DOC_REL_NS}}}id")]
+            sheet_paths[sheet.get("name")] = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        return sheet_paths
+
+    def _read_shared_strings(self):
+        if "xl/sharedStrings.xml" not in self.archive.namelist():
+            return []
+        strings = []
+        with self.archive.open("xl/sharedStrings.xml") as stream:
+            for _, elem in ET.iterparse(stream):
+                if elem.tag == f"{{{SHEET_NS}}}si":
+                    strings.append("".join(text.text or "" for text in elem.iter(f"{{{SHEET_NS}}}t")))
+                    elem.clear()
+        return strings
+
+    def _cell_value(self, cell):
+        cell_type = cell.get("t", "n")
+        if cell_type == "inlineStr":
+            return "".join(text.text or "" for text in cell.iter(f"{{{SHEET_NS}}}t"))
+        value = cell.findtext(f"{{{SHEET_NS}}}v")
+        if value is None:
+            return None
+        if cell_type == "s":
+            return self.shared_strings[int(value)]
+        if cell_type == "b":
+            return value == "1"
+        if cell_type in ("str", "e"):
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+    def iter_rows(self, sheet_name, min_row=1):
+        """Yield (row_number, values) for each row of a sheet, with values indexed by column."""
+        row_number = 0
+        with self.archive.open(self.sheet_paths[sheet_name]) as stream:
+            for _, elem in ET.iterparse(stream):
+                if elem.tag != f"{{{SHEET_NS}}}row":
+                    continue
+                row_number = int(elem.get("r", row_number + 1))
+                if row_number >= min_row:
+                    values = []
+                    for cell in elem.iter(f"{{{SHEET_NS}}}c"):
+                        reference = cell.get("r")
+                        column = column_index(reference) if reference else len(values)
+                        values.extend([None] * (column - len(values)))
+                        values.append(self._cell_value(cell))
+                    yield row_number, values
+                elem.clear()
+
+def column_index(cell_reference):
+    """Convert the column letters of a cell reference (e.g. "AB12") to a zero-based index."""
+    index = 0
+    for char in cell_reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+def get_column(values, index):
+    return values[index] if index < len(values) else None
+
+def parse_param(text):
+    """Parse a parameter such as "Card c", "[int count]" or "int count=1" into an ApiParam."""
+    optional = text.startswith("[") and text.endswith("]")
+    declaration = text.strip("[]").strip()
+    if "=" in declaration:
+        declaration = declaration.split("=", 1)[0].strip()
+        optional = True
+    parts = declaration.rsplit(None, 1)
+    if len(parts) == 2:
+        return ApiParam(parts[0], parts[1], optional, text)
+    return ApiParam("any", declaration, optional, text)
+
+def extract_api_functions(workbook):
+    rows = []
+
+    # The first two rows of the sheet are headers
+    for _, values in workbook.iter_rows("Functions", min_row=3):
+        ret_type, signature, description = (get_column(values, index) for index in range(3))
+        if signature is not None:
+            rows.append((ret_type, str(signature), description))
+
     functions = []
-    
-    for _, row in functions_df.iterrows():
-        ret_type, signature, description = row["value"], row["name"], row["desc"]
-        description = str(description) if pd.notna(description) else ""  # Ensure description is a string
-        namespace, func_name, params = parse_function_signature(signature)
+    for (ret_type, _, description), (namespace, func_name, params) in zip(rows, parse_function_signatures(row[1] for row in rows)):
         if func_name:
-            functions.append((func_name, ret_type, params, description))
-    
+            description = str(description) if description is not None else ""  # Ensure description is a string
+            ret_type = str(ret_type) if ret_type is not None else ""
+            functions.append(ApiFunction(namespace, func_name, tuple(map(parse_param, params)), ret_type, description))
+
     return functions
 
-def extract_constants(file_path):
-    # Load the relevant sheets
-    constants_df = pd.read_excel(file_path, sheet_name="Constants", usecols=[1])  # Second column
-    archetype_df = pd.read_excel(file_path, sheet_name="Archetype constants", usecols=[0])  # First column
-    
-    # Drop the header row
-    constants = constants_df.iloc[1:, 0].dropna().tolist()
-    archetypes = archetype_df.iloc[1:, 0].dropna().tolist()
-    
-    return constants + archetypes
-
-def prettify_xml(element):
-    rough_string = ET.tostring(element, encoding="utf-8")
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="    ")
+def extract_functions(workbook):
+    """Return the functions as (name, return type, parameters, description) tuples."""
+    return [(function.name, function.return_type, [param.text for param in function.params], function.description)
+            for function in extract_api_functions(workbook)]
 
+def extract_constants(workbook):
+    # Constant names are in the second column of "Constants" and the first of "Archetype constants",
+    # after two header rows
+    constants = [get_column(values, 1) for _, values in workbook.iter_rows("Constants", min_row=3)]
+    archetypes = [get_column(values, 0) for _, values in workbook.iter_rows("Archetype constants", min_row=3)]
+
+    return [str(constant) for constant in constants + archetypes if constant is not None]
+
+@functools.lru_cache(maxsize=None)
 def format_description(description, max_length=80):
+    """
+    Wrap a description into lines of at most max_length characters, breaking at the last space.
+    Results are memoized, since many overloads share the same description.
+    """
     # Decode HTML entities
     description = html.unescape(description)
-    
-    # Split the description into lines of a maximum length
+
+    # Split the description into lines of a maximum length. The remaining text is tracked
+    # with start/end offsets instead of being sliced again for every line, keeping this linear.
     lines = []
-    while len(description) > max_length:
+    start, end = 0, len(description)
+    while end - start > max_length:
         # Find the last space before the max length
-        break_point = description.rfind(' ', 0, max_length)
+        break_point = description.rfind(' ', start, start + max_length)
         if break_point == -1:
-            break_point = max_length  # If no space, just break at max length
-        lines.append(description[:break_point].strip())
-        description = description[break_point:].strip()
+            break_point = start + max_length  # If no space, just break at max length
+        lines.append(description[start:break_point].strip())
+
+        # Strip the remaining part of the description
+        start = break_point
+        while start < end and description[start].isspace():
+            start += 1
+        while end > start and description[end - 1].isspace():
+            end -= 1
 
     # Add the remaining part of the description
-    if description:
-        lines.append(description)
+    if start < end:
+        lines.append(description[start:end])
 
     # Return the formatted description, joined by a newline
     return '\n'.join(lines)
 
-def generate_autocomplete_xml(functions, constants, output_file="notepadpp_autocomplete.xml"):
-    root = ET.Element("NotepadPlus")
-    autocomplete = ET.SubElement(root, "AutoComplete")
+def escape_attribute(value):
+    """Escape an attribute value the way minidom's pretty printer does."""
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;").replace(">", "&gt;")
 
-    # Add functions to XML
+def iter_autocomplete_xml(functions, constants):
+    """
+    Yield the Notepad++ auto-completion XML piece by piece, with the layout of minidom's
+    toprettyxml(indent="    "). Keywords are sorted and unique, as Notepad++ requires:
+    overloads of a function share one KeyWord, and constants named like a function are dropped.
+    """
+    overloads = {}
     for func_name, ret_type, params, description in functions:
-        keyword = ET.SubElement(autocomplete, "KeyWord", name=func_name, func="yes")
-        formatted_desc = format_description(description)
-        overload = ET.SubElement(keyword, "Overload", retVal=ret_type, descr=formatted_desc)  # Added formatted description
-        
-        for param in params:
-            ET.SubElement(overload, "Param", name=param)
-    
-    # Add constants to XML
-    for constant in constants:
-        ET.SubElement(autocomplete, "KeyWord", name=constant)
-    
-    formatted_xml = prettify_xml(root)
-    
+        overloads.setdefault(func_name, []).append((ret_type, params, description))
+    keywords = set(overloads).union(constants)
+
+    yield '<?xml version="1.0" ?>\n<NotepadPlus>\n'
+    if not keywords:
+        yield '    <AutoComplete/>\n</NotepadPlus>\n'
+        return
+
+    yield '    <AutoComplete>\n'
+    for name in sorted(keywords):
+        if name not in overloads:
+            yield f'        <KeyWord name="{escape_attribute(name)}"/>\n'
+            continue
+        yield f'        <KeyWord name="{escape_attribute(name)}" func="yes">\n'
+        for ret_type, params, description in overloads[name]:
+            overload = f'            <Overload retVal="{escape_attribute(ret_type)}" descr="{escape_attribute(format_description(description))}"'
+            if not params:
+                yield f'{overload}/>\n'
+                continue
+            yield f'{overload}>\n'
+            for param in params:
+                yield f'                <Param name="{escape_attribute(param)}"/>\n'
+            yield '            </Overload>\n'
+        yield '        </KeyWord>\n'
+    yield '    </AutoComplete>\n</NotepadPlus>\n'
+
+@timed("api.generate_autocomplete_xml")
+def generate_autocomplete_xml(functions, constants, output_file="notepadpp_autocomplete.xml"):
+    # Stream the keywords straight to the file instead of building and re-parsing a DOM
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.writelines(iter_autocomplete_xml(functions, constants))
+
+@timed("api.read_workbook")
+def read_api_model(file_path):
+    """Parse the functions and constants of the API workbook into an ApiModel."""
+    with XlsxWorkbook(file_path) as workbook:
+        return ApiModel(extract_api_functions(workbook), extract_constants(workbook))
+
+def load_api_model(file_path, cache_path=None):
+    """
+    Load the ApiModel of a workbook, reusing the cached model while the workbook's content hash is unchanged.
+    The cache is a JSON file, by default next to the workbook.
+    """
+    cache_path = cache_path or f"{file_path}.model.json"
+    with open(file_path, "rb") as f:
+        workbook_hash = hashlib.blake2b(f.read()).hexdigest()
+
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == MODEL_CACHE_VERSION and cache.get("hash") == workbook_hash:
+            functions = [ApiFunction(namespace, name, tuple(ApiParam(*param) for param in params), return_type, description)
+                         for namespace, name, params, return_type, description in cache["functions"]]
+            count("api.model_cache_hits")
+            return ApiModel(functions, cache["constants"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    model = read_api_model(file_path)
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MODEL_CACHE_VERSION, "hash": workbook_hash,
+                   "functions": model.functions, "constants": model.constants}, f)
+    os.replace(temp_path, cache_path)
+    return model
+
+def get_qualified_name(function):
+    return f"{function.namespace}.{function.name}"
+
+def get_snippet_body(function):
+    """Build a snippet body with a tab stop for each parameter, e.g. "Card.GetCode(${1:c})"."""
+    placeholders = []
+    for index, param in enumerate(function.params, 1):
+        name = param.name.replace("\\", "\\\\").replace("$", "\\$").replace("}", "\\}")
+        placeholders.append(f"${{{index}:{name}}}")
+    return f"{get_qualified_name(function)}({', '.join(placeholders)})"
+
+def export_notepadpp(model, output_file):
+    functions = [(function.name, function.return_type, [param.text for param in function.params], function.description)
+                 for function in model.functions]
+    generate_autocomplete_xml(functions, model.constants, output_file)
+
+def export_vscode(model, output_file):
+    """Write a VS Code .code-snippets file."""
+    snippets = {}
+    for function in model.functions:
+        key = get_qualified_name(function)
+        # Overloads need distinct snippet names
+        suffix = 2
+        while key in snippets:
+            key = f"{get_qualified_name(function)} ({suffix})"
+            suffix += 1
+        snippets[key] = {
+            "scope": "lua",
+            "prefix": get_qualified_name(function),
+            "body": get_snippet_body(function),
+            "description": f"{function.return_type} {get_qualified_name(function)}({', '.join(param.text for param in function.params)})\n"
+                           f"{html.unescape(function.description)}".rstrip(),
+        }
+    for constant in model.constants:
+        snippets.setdefault(constant, {"scope": "lua", "prefix": constant, "body": constant.replace("$", "\\$")})
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(snippets, f, indent=2, ensure_ascii=False)
+
+def export_sublime(model, output_file):
+    """Write a Sublime Text .sublime-completions file."""
+    completions = [
+        {
+            "trigger": get_qualified_name(function),
+            "contents": get_snippet_body(function),
+            "kind": "function",
+            "annotation": function.return_type,
+            "details": html.escape(html.unescape(function.description).split("\n", 1)[0]),
+        }
+        for function in model.functions
+    ]
+    completions.extend({"trigger": constant, "contents": constant, "kind": "variable"} for constant in model.constants)
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"scope": "source.lua", "completions": completions}, f, indent=2, ensure_ascii=False)
+
+def get_luals_type(type_name):
+    return "|".join(LUALS_TYPES.get(part.strip(), part.strip()) for part in type_name.split("|"))
+
+def get_luals_param_name(param, index):
+    if param.name == "..." or (param.name.isidentifier() and param.name not in LUA_KEYWORDS):
+        return param.name
+    return f"p{index}"
+
+def get_luals_signature(function):
+    names = [get_luals_param_name(param, index) for index, param in enumerate(function.params, 1)]
+    returns = get_luals_type(function.return_type) if function.return_type not in ("", "void") else None
+    return names, returns
+
+def export_luals(model, output_file):
+    """Write a Lua Language Server definition file (---@meta) with the functions' annotations."""
+    lines = ["---@meta", ""]
+
+    for namespace in sorted({function.namespace for function in model.functions}):
+        lines.extend([f"---@class {namespace}", f"{namespace} = {{}}", ""])
+
+    # The first declaration of a function is annotated in full, the others become @overload annotations
+    overloads = {}
+    for function in model.functions:
+        overloads.setdefault(get_qualified_name(function), []).append(function)
+
+    for qualified_name, (function, *others) in overloads.items():
+        names, returns = get_luals_signature(function)
+        lines.extend(f"---{line}" for line in format_description(function.description).split("\n") if line)
+        for name, param in zip(names, function.params):
+            lines.append(f"---@param {name}{'?' if param.optional else ''} {get_luals_type(param.type)}")
+        if returns:
+            lines.append(f"---@return {returns}")
+        for other in others:
+            other_names, other_returns = get_luals_signature(other)
+            signature = ", ".join(f"{name}{'?' if param.optional else ''}: {get_luals_type(param.type)}"
+                                  for name, param in zip(other_names, other.params))
+            lines.append(f"---@overload fun({signature}){': ' + other_returns if other_returns else ''}")
+        lines.extend([f"function {qualified_name}({', '.join(names)}) end", ""])
+
+    for constant in model.constants:
+        if constant.isidentifier():
+            lines.extend(["---@type integer", f"{constant} = nil", ""])
+
     with open(output_file, "w", encoding="utf-8") as f:
-        f.write(formatted_xml)
+        f.write("\n".join(lines))
 
+# Exporters by format name, with their default output file
+EXPORTERS = {
+    "notepadpp": (export_notepadpp, "notepadpp_autocomplete.xml"),
+    "vscode": (export_vscode, "edopro.code-snippets"),
+    "luals": (export_luals, "edopro_api.lua"),
+    "sublime": (export_sublime, "edopro.sublime-completions"),
+}
+LUALS_TYPES = {"int": "integer", "bool": "boolean", "void": "nil", "function": "function", "table": "table"}
+LUA_KEYWORDS = {"and", "break", "do", "else", "elseif", "end", "false", "for", "function", "goto", "if", "in",
+                "local", "nil", "not", "or", "repeat", "return", "then", "true", "until", "while"}
 
+def export_api(file_path, formats=tuple(EXPORTERS), output_dir="."):
+    """Parse (or load from cache) the API model once and run every selected exporter on it."""
+    model = load_api_model(file_path)
+    for format_name in formats:
+        exporter, output_file = EXPORTERS[format_name]
+        with span(f"api.export.{format_name}"):
+            exporter(model, os.path.join(output_dir, output_file))
+        print(f"{output_file} generated with {len(model.functions)} functions and {len(model.constants)} constants.")
+    return model
 
 if __name__ == "__main__":
     file_path = "Bastion.xlsx"  # Update with the correct path if needed
-    functions = extract_functions(file_path)
-    constants = extract_constants(file_path)
-    generate_autocomplete_xml(functions, constants)
-    print(f"Auto-completion XML file generated successfully with {len(functions)} functions and {len(constants)} constants.")
+    model = load_api_model(file_path)
+    export_notepadpp(model, "notepadpp_autocomplete.xml")
+    print(f"Auto-completion XML file generated successfully with {len(model.functions)} functions and {len(model.constants)} constants.")
@@ -0,0 +1,127 @@
+"""
+Lightweight per-stage timing and counters for the scripts.
+
+Stages are timed with span() (a context manager) or @timed (a decorator), and work is
+counted with count(). Nothing is recorded unless profiling is enabled, either with
+enable() (cli.py --profile) or by setting PYSCRIPTS_PROFILE=1 (or true/yes); the report
+is then printed as a table when the process exits, and written as JSON to
+PYSCRIPTS_PROFILE_OUTPUT if set. PYSCRIPTS_CPROFILE=<file> also dumps cProfile stats.
+"""
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_spans = {}  # name -> [calls, total seconds]
+_counters = {}
+_profiler = None
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stats = _spans.setdefault(self.name, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Time the enclosed block as the stage `name` when profiling is enabled."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+def timed(name):
+    """Decorator timing every call of a function as the stage `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, amount=1):
+    """Add `amount` to the counter `name` when profiling is enabled."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+def is_enabled():
+    return _enabled
+
+def enable(output_path=None, cprofile_path=None):
+    """
+    Start recording spans and counters. At exit, the report is printed to stderr and,
+    if output_path is given, written there as JSON; cprofile_path receives cProfile stats.
+    """
+    global _enabled, _profiler
+    if _enabled:
+        return
+    _enabled = True
+    if cprofile_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_finish, output_path, cprofile_path)
+
+def get_report():
+    """Return the recorded spans and counters as a JSON-serializable dictionary."""
+    with _lock:
+        return {
+            "spans": {name: {"calls": calls, "seconds": round(seconds, 6)} for name, (calls, seconds) in _spans.items()},
+            "counters": dict(_counters),
+        }
+
+def format_report(report=None):
+    """Format a report as a human-readable table, slowest stages first."""
+    report = report or get_report()
+    lines = [f"{'stage':<40} {'calls':>8} {'seconds':>10}"]
+    for name, stats in sorted(report["spans"].items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(f"{name:<40} {stats['calls']:>8} {stats['seconds']:>10.4f}")
+    if report["counters"]:
+        lines.append("")
+        lines.append(f"{'counter':<40} {'value':>19}")
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"{name:<40} {value:>19}")
+    return "\n".join(lines)
+
+def _finish(output_path, cprofile_path):
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(cprofile_path)
+    report = get_report()
+    print(f"\n{format_report(report)}", file=sys.stderr)
+    if output_path:
+        with open(output_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+# Worker processes of the pools inherit the environment, but only the main process reports
+if os.environ.get("PYSCRIPTS_PROFILE", "").strip().lower() in ("1", "true", "yes", "on") and multiprocessing.parent_process() is None:
+    enable(os.environ.get("PYSCRIPTS_PROFILE_OUTPUT"), os.environ.get("PYSCRIPTS_CPROFILE"))
@@ -1,5 +1,28 @@
+import hashlib
 import os
-from PIL import Image
+import sqlite3
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import closing
+
+from instrumentation import count, timed
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Start-of-frame markers carry the image dimensions (DHT, JPG and DAC are excluded)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field: TEM, RST0-RST7, SOI and EOI
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9}
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+HASH_CHUNK_SIZE = 1 << 20
+CACHE_FILE = "pics_cache.db"
+CACHE_SCHEMA_VERSION = 2
+# Low resolution pics that must be regenerated, and the HD size they are normalized to
+LOW_RES_DIMENSIONS = [(177, 254), (254, 177)]
+NORMALIZED_SIZE = (813, 1185)
+
+ImageRecord = namedtuple("ImageRecord", ["name", "size", "mtime_ns", "format", "width", "height", "hash"])
 
 def option_one():
     print("Option 1 selected: Remove duplicated pics (keeping PNG).")
@@ -8,7 +31,7 @@ def option_one():
 
     if not os.path.exists(subdirectory):
         print(f"The directory '{subdirectory}' does not exist. Please ensure it is present in the current working directory.")
-        return
+        return False
 
     # Scan for image files
     files = os.listdir(subdirectory)
@@ -28,7 +51,167 @@ def option_one():
 
     print("Duplicate removal process completed.")
 
-def option_two():
+def read_image_header(file_path):
+    """
+    Read the format and dimensions of a PNG or JPEG image from its header bytes only.
+    Returns (format, width, height), or None when the file is not a PNG/JPEG
+    or the header is truncated.
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(24)
+        if head[:8] == PNG_SIGNATURE:
+            if len(head) < 24 or head[12:16] != b'IHDR':
+                return None
+            width, height = struct.unpack('>II', head[16:24])
+            return 'PNG', width, height
+
+        if head[:2] != b'\xff\xd8':
+            return None
+
+        # Walk the JPEG markers until the first start-of-frame segment
+        file.seek(2)
+        while True:
+            byte = file.read(1)
+            while byte and byte != b'\xff':
+                byte = file.read(1)
+            while byte == b'\xff':  # Skip fill bytes
+                byte = file.read(1)
+            if not byte:
+                return None
+
+            marker = byte[0]
+            if marker in JPEG_STANDALONE_MARKERS:
+                continue
+            segment_length = file.read(2)
+            if len(segment_length) < 2:
+                return None
+            length = struct.unpack('>H', segment_length)[0]
+            if marker in JPEG_SOF_MARKERS:
+                frame = file.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return 'JPEG', width, height
+            file.seek(length - 2, os.SEEK_CUR)
+
+def read_image_size(file_path):
+    """
+    Read the (width, height) of a PNG or JPEG image from its header bytes only.
+    Returns None when the file is not a PNG/JPEG or the header is truncated.
+    """
+    header = read_image_header(file_path)
+    return header[1:] if header else None
+
+def get_image_info(file_path):
+    """
+    Get the (format, width, height) of an image, falling back to Pillow for
+    files whose header can't be parsed directly.
+    """
+    header = read_image_header(file_path)
+    if header is None:
+        count("pics.pillow_decodes")
+        from PIL import Image
+        with Image.open(file_path) as img:
+            header = (img.format, *img.size)
+    return header
+
+def get_image_size(file_path):
+    """
+    Get the (width, height) of an image, falling back to Pillow for
+    files whose header can't be parsed directly.
+    """
+    return get_image_info(file_path)[1:]
+
+def hash_file(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """Compute the BLAKE2b digest of a file, reading it in fixed-size chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+            count("pics.bytes_hashed", len(chunk))
+    return digest.hexdigest()
+
+def _examine_image(task):
+    file_path, with_hash = task
+    try:
+        image_format, width, height = get_image_info(file_path)
+        content_hash = hash_file(file_path) if with_hash else None
+        return (image_format, width, height, content_hash), None
+    except Exception as e:
+        return None, e
+
+def open_pics_cache(cache_path=CACHE_FILE):
+    """
+    Open (creating it if needed) the SQLite image-metadata cache.
+    Rows are keyed on the scanned folder and the file name, so one cache serves several folders.
+    """
+    conn = sqlite3.connect(cache_path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < CACHE_SCHEMA_VERSION:
+        with conn:
+            # Caches written before rows were keyed on the folder are discarded, once
+            conn.execute("DROP TABLE IF EXISTS images")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_files ("
+                "folder TEXT, name TEXT, size INTEGER, mtime_ns INTEGER, "
+                "format TEXT, width INTEGER, height INTEGER, hash TEXT, PRIMARY KEY (folder, name))"
+            )
+            conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+    return conn
+
+def get_cache_folder(subdirectory):
+    """The key of a scanned folder in the metadata cache."""
+    return os.path.normcase(os.path.abspath(subdirectory))
+
+@timed("pics.scan")
+def scan_pics(subdirectory="pics", cache_path=CACHE_FILE, workers=None, with_hash=False):
+    """
+    Scan the image files of a directory and return a dictionary of {file_name: ImageRecord}.
+    Files whose size and mtime match the cache are not opened again; only new or
+    changed files are examined. Unreadable files are reported and left out.
+    """
+    records = {}
+    to_examine = []
+    folder = get_cache_folder(subdirectory)
+
+    with closing(open_pics_cache(cache_path)) as conn:
+        cached = {row[0]: ImageRecord(*row) for row in conn.execute(
+            "SELECT name, size, mtime_ns, format, width, height, hash FROM image_files WHERE folder = ?", (folder,))}
+
+        for entry in os.scandir(subdirectory):
+            if not entry.name.lower().endswith(('.png', '.jpg')) or not entry.is_file():
+                continue
+            stat = entry.stat()
+            record = cached.get(entry.name)
+            if (record and record.size == stat.st_size and record.mtime_ns == stat.st_mtime_ns
+                    and (record.hash or not with_hash)):
+                records[entry.name] = record
+            else:
+                to_examine.append((entry.name, entry.path, stat))
+
+        # Header reads are I/O bound, so a thread pool keeps every worker busy
+        updated = []
+        with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as executor:
+            tasks = [(path, with_hash) for _, path, _ in to_examine]
+            for (file_name, _, stat), (info, error) in zip(to_examine, executor.map(_examine_image, tasks)):
+                if error is not None:
+                    print(f"Error processing file {file_name}: {error}")
+                    continue
+                record = ImageRecord(file_name, stat.st_size, stat.st_mtime_ns, *info)
+                records[file_name] = record
+                updated.append(record)
+
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO image_files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             ((folder, *record) for record in updated))
+            removed = [(folder, name) for name in cached.keys() - records.keys()]
+            conn.executemany("DELETE FROM image_files WHERE folder = ? AND name = ?", removed)
+
+    count("pics.files_scanned", len(records))
+    count("pics.files_examined", len(to_examine))
+    print(f"Examined {len(to_examine)} new or changed files, {len(records) - len(updated)} loaded from cache.")
+    return records
+
+def option_two(workers=None):
     print("Option 2 selected: Dimension checker.")
     # Directory containing images
     subdirectory = "pics"
@@ -36,64 +219,286 @@ def option_two():
 
     if not os.path.exists(subdirectory):
         print(f"The directory '{subdirectory}' does not exist. Please ensure it is present in the current working directory.")
-        return
-
-    target_dimensions = [(177, 254), (254, 177)]
+        return False
 
-    valid_files = []
+    target_dimensions = LOW_RES_DIMENSIONS
 
-    for file_name in os.listdir(subdirectory):
-        if not file_name.lower().endswith(('.png', '.jpg')):
-            continue
+    start_time = time.perf_counter()
+    records = scan_pics(subdirectory, workers=workers)
+    elapsed = time.perf_counter() - start_time
 
+    valid_files = []
+    for file_name, record in records.items():
         stem, _ = os.path.splitext(file_name)
         if not stem.isdigit() or int(stem) >= 120120120:
             continue
-
-        file_path = os.path.join(subdirectory, file_name)
-        try:
-            with Image.open(file_path) as img:
-                dimensions = img.size
-                if dimensions in target_dimensions:
-                    valid_files.append(stem)
-        except Exception as e:
-            print(f"Error processing file {file_name}: {e}")
+        if (record.width, record.height) in target_dimensions:
+            valid_files.append(stem)
 
     with open(output_file, "w") as f:
         for stem in sorted(valid_files):
             f.write(f"{stem}\n")
 
+    rate = len(records) / elapsed if elapsed > 0 else float('inf')
+    print(f"Scanned {len(records)} files in {elapsed:.2f}s ({rate:.0f} files/s).")
     print(f"Dimension check completed. Results written to '{output_file}'.")
 
-def option_three():
-    print("Option 3 selected: Performing task for Option 3.")
-    # Example functionality for Option 3
-    print("Task for Option 3 completed successfully.")
+def dhash_image(file_path, hash_size=8):
+    """Compute a 64-bit difference hash, which survives re-encoding and resizing."""
+    from PIL import Image
+    with Image.open(file_path) as img:
+        img.draft('L', (hash_size * 4, hash_size * 4))  # Let JPEG decode at reduced scale
+        pixels = list(img.convert('L').resize((hash_size + 1, hash_size)).getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+def _dhash_task(file_path):
+    try:
+        return dhash_image(file_path), None
+    except Exception as e:
+        return None, e
+
+def _hash_task(file_path):
+    try:
+        return hash_file(file_path), None
+    except OSError as e:
+        return None, e
+
+@timed("pics.dedup_hash")
+def hash_missing_files(subdirectory, records, names, workers=None, cache_path=CACHE_FILE):
+    """Hash the given files on a thread pool, updating their records and the metadata cache."""
+    new_hashes = []
+    folder = get_cache_folder(subdirectory)
+    workers = workers or DEFAULT_WORKERS
+    paths = (os.path.join(subdirectory, name) for name in names)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, (content_hash, error) in _bounded_map(executor, _hash_task, paths, workers * 4):
+            name = os.path.basename(path)
+            if error is not None:
+                print(f"Error hashing file {name}: {error}")
+                continue
+            records[name] = records[name]._replace(hash=content_hash)
+            new_hashes.append((content_hash, folder, name))
+    with closing(open_pics_cache(cache_path)) as conn, conn:
+        conn.executemany("UPDATE image_files SET hash = ? WHERE folder = ? AND name = ?", new_hashes)
+
+@timed("pics.dedup_perceptual")
+def find_similar_groups(subdirectory, names, workers=None):
+    """Group the given files by perceptual hash. Decoding is CPU bound, so this uses processes instead of threads."""
+    paths = (os.path.join(subdirectory, name) for name in names)
+    dhash_groups = {}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, (value, error) in _bounded_map(executor, _dhash_task, paths, workers * 4):
+            name = os.path.basename(path)
+            if error is not None:
+                print(f"Error decoding file {name}: {error}")
+                continue
+            dhash_groups.setdefault(value, []).append(name)
+    # Results arrive in completion order, so the groups are sorted for a stable report
+    return sorted(sorted(group) for group in dhash_groups.values() if len(group) > 1)
+
+def find_duplicate_groups(subdirectory="pics", workers=None, perceptual=False, cache_path=CACHE_FILE):
+    """
+    Find groups of duplicated images.
+    Files are bucketed by size first, so only files sharing a size are hashed (streamed,
+    BLAKE2b); hashes are stored in the metadata cache. With perceptual=True, one file per
+    distinct content is also decoded in a process pool to find visually identical images.
+    Returns (identical_groups, similar_groups), each a list of sorted lists of file names.
+    """
+    records = scan_pics(subdirectory, cache_path, workers)
+
+    size_buckets = {}
+    for record in records.values():
+        size_buckets.setdefault(record.size, []).append(record.name)
+    candidates = [name for names in size_buckets.values() if len(names) > 1 for name in names]
+
+    missing = [name for name in candidates if records[name].hash is None]
+    if missing:
+        hash_missing_files(subdirectory, records, missing, workers, cache_path)
+
+    hash_groups = {}
+    for name in candidates:
+        if records[name].hash is not None:
+            hash_groups.setdefault((records[name].size, records[name].hash), []).append(name)
+    identical_groups = sorted(sorted(names) for names in hash_groups.values() if len(names) > 1)
+
+    similar_groups = []
+    if perceptual:
+        duplicated = {name for group in identical_groups for name in group[1:]}
+        similar_groups = find_similar_groups(subdirectory, sorted(name for name in records if name not in duplicated), workers)
+
+    return identical_groups, similar_groups
+
+def replace_with_hardlink(source_path, link_path):
+    """Atomically replace link_path with a hard link to source_path."""
+    temp_path = link_path + ".tmp"
+    os.link(source_path, temp_path)
+    os.replace(temp_path, link_path)
+
+def option_three(action="report", perceptual=False, workers=None):
+    print("Option 3 selected: Find duplicated pics by content.")
+    # Directory containing images
+    subdirectory = "pics"
+
+    if not os.path.exists(subdirectory):
+        print(f"The directory '{subdirectory}' does not exist. Please ensure it is present in the current working directory.")
+        return False
+
+    identical_groups, similar_groups = find_duplicate_groups(subdirectory, workers, perceptual)
+
+    wasted = 0
+    for group in identical_groups:
+        kept_path = os.path.join(subdirectory, group[0])
+        print(f"Identical: {', '.join(group)}")
+        for name in group[1:]:
+            file_path = os.path.join(subdirectory, name)
+            try:
+                if os.path.samefile(kept_path, file_path):
+                    continue  # Already hardlinked
+                wasted += os.path.getsize(file_path)
+                if action == "remove":
+                    os.remove(file_path)
+                    print(f"Removed duplicate: {file_path}")
+                elif action == "hardlink":
+                    replace_with_hardlink(kept_path, file_path)
+                    print(f"Hardlinked {file_path} to {kept_path}")
+            except OSError as e:
+                print(f"Error processing file {file_path}: {e}")
+
+    # Visually identical files may still differ in quality, so they are only reported
+    for group in similar_groups:
+        print(f"Visually identical: {', '.join(group)}")
+
+    print(f"Found {len(identical_groups)} groups of identical pics ({wasted / (1 << 20):.1f} MiB in duplicates)"
+          f" and {len(similar_groups)} groups of visually identical pics.")
+
+def _bounded_map(executor, fn, items, max_pending):
+    """
+    Like executor.map, but only keeps max_pending tasks in flight, so a lazy iterable
+    is consumed as workers free up. Results are yielded in completion order as (item, result).
+    """
+    pending = {}
+    for item in items:
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+        pending[executor.submit(fn, item)] = item
+    for future in as_completed(pending):
+        yield pending[future], future.result()
+
+def _normalize_task(task):
+    file_path, target_size, jpeg_quality = task
+    temp_path = file_path + ".tmp"
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            image_format = img.format
+            resized = img.resize(target_size, Image.LANCZOS)
+        if image_format == 'JPEG':
+            resized.convert('RGB').save(temp_path, 'JPEG', quality=jpeg_quality, optimize=True)
+        else:
+            resized.save(temp_path, image_format, optimize=True)
+        os.replace(temp_path, file_path)
+        return None
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return e
+
+@timed("pics.normalize")
+def normalize_pics(subdirectory="pics", target_size=NORMALIZED_SIZE, source_dimensions=LOW_RES_DIMENSIONS,
+                   jpeg_quality=90, workers=None, dry_run=False):
+    """
+    Resize and re-encode every pic whose dimensions are in source_dimensions to target_size
+    (swapped for landscape pics), replacing each file atomically.
+    Files are streamed through a process pool with a bounded number of pending tasks.
+    Returns the number of normalized (or, on a dry run, selected) files.
+    """
+    records = scan_pics(subdirectory, workers=workers)
+    width, height = target_size
+
+    def selected_tasks():
+        for name in sorted(records):
+            record = records[name]
+            if (record.width, record.height) not in source_dimensions:
+                continue
+            size = (height, width) if record.width > record.height else (width, height)
+            yield os.path.join(subdirectory, name), size, jpeg_quality
+
+    if dry_run:
+        normalized = 0
+        for file_path, size, _ in selected_tasks():
+            print(f"Would resize {file_path} to {size[0]}x{size[1]}")
+            normalized += 1
+        return normalized
+
+    normalized = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (file_path, _, _), error in _bounded_map(executor, _normalize_task, selected_tasks(), workers * 4):
+            if error is not None:
+                print(f"Error normalizing file {file_path}: {error}")
+            else:
+                normalized += 1
+    return normalized
+
+def option_four(dry_run=False, workers=None):
+    print("Option 4 selected: Normalize off-size pics.")
+    # Directory containing images
+    subdirectory = "pics"
+
+    if not os.path.exists(subdirectory):
+        print(f"The directory '{subdirectory}' does not exist. Please ensure it is present in the current working directory.")
+        return False
+
+    start_time = time.perf_counter()
+    normalized = normalize_pics(subdirectory, workers=workers, dry_run=dry_run)
+    elapsed = time.perf_counter() - start_time
+
+    if dry_run:
+        print(f"Dry run completed. {normalized} pics would be normalized.")
+    else:
+        print(f"Normalization completed. {normalized} pics normalized in {elapsed:.2f}s.")
 
 def main():
     while True:
         print("\nPlease select an option:")
         print("1. Remove duplicated pics (keeping PNG)")
         print("2. Dimension checker")
-        print("3. Execute Option 3")
-        print("4. Exit")
+        print("3. Find duplicated pics by content")
+        print("4. Normalize off-size pics")
+        print("5. Exit")
 
         try:
-            choice = int(input("Enter your choice (1-4): "))
+            choice = int(input("Enter your choice (1-5): "))
 
             if choice == 1:
                 option_one()
             elif choice == 2:
                 option_two()
             elif choice == 3:
-                option_three()
+                action = input("Action for identical pics (report/hardlink/remove) [report]: ").strip().lower() or "report"
+                if action not in ("report", "hardlink", "remove"):
+                    print("Invalid action. Please enter report, hardlink or remove.")
+                    continue
+                perceptual = input("Also look for visually identical pics? (y/N): ").strip().lower() == "y"
+                option_three(action, perceptual)
             elif choice == 4:
+                dry_run = input("Dry run only? (y/N): ").strip().lower() == "y"
+                option_four(dry_run)
+            elif choice == 5:
                 print("Exiting the program. Goodbye!")
                 break
             else:
-                print("Invalid choice. Please enter a number between 1 and 4.")
+                print("Invalid choice. Please enter a number between 1 and 5.")
         except ValueError:
-            print("Invalid input. Please enter a number between 1 and 4.")
+            print("Invalid input. Please enter a number between 1 and 5.")
 
 if __name__ == "__main__":
     main()
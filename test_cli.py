@@ -0,0 +1,60 @@
+import os
+import shlex
+import unittest
+
+import cli
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def get_examples():
+    """The cli.py command lines shown in the README and in the cli.py docstring."""
+    with open(os.path.join(ROOT, "README.md"), encoding="utf-8") as f:
+        lines = f.read().splitlines() + cli.__doc__.splitlines()
+    return [shlex.split(line.strip())[2:] for line in lines if line.strip().startswith("python cli.py ")]
+
+def parse(argv):
+    parser = cli.build_parser()
+    global_args, chunks = cli.split_commands(parser, argv)
+    return global_args, cli.parse_commands(parser, chunks)
+
+class ExamplesTest(unittest.TestCase):
+    def test_examples_parse(self):
+        examples = get_examples()
+        self.assertGreater(len(examples), 5)
+        for argv in examples:
+            with self.subTest(argv=argv):
+                _, commands = parse(argv)
+                self.assertTrue(all(callable(args.handler) for args in commands))
+
+class SplitCommandsTest(unittest.TestCase):
+    def test_chained_commands(self):
+        _, commands = parse(["banlist", "worlds", "banlist", "traditional"])
+        self.assertEqual([args.handler for args in commands], [cli.run_banlist_worlds, cli.run_banlist_traditional])
+
+    def test_option_values_named_like_groups(self):
+        _, commands = parse(["report", "consistency", "--database", "cards.cdb", "--pics", "pics", "--scripts", "scripts",
+                             "pics", "check-dims"])
+        self.assertEqual(len(commands), 2)
+        self.assertEqual((commands[0].pics, commands[0].scripts), ("pics", "scripts"))
+        self.assertEqual(commands[1].handler, cli.run_pics_check_dims)
+
+    def test_repeated_options_stop_at_the_next_command(self):
+        _, commands = parse(["banlist", "merge", "-i", "a.conf", "-i", "b.conf", "-o", "c.conf", "--label", "C",
+                             "banlist", "worlds"])
+        self.assertEqual(commands[0].inputs, ["a.conf", "b.conf"])
+        self.assertEqual(commands[1].handler, cli.run_banlist_worlds)
+
+    def test_optional_value(self):
+        _, commands = parse(["scripts", "fix-names", "--database", "cards.cdb", "--scripts", "script", "--git",
+                             "api", "export"])
+        self.assertEqual(commands[0].git, "HEAD")
+        _, commands = parse(["scripts", "fix-names", "--database", "cards.cdb", "--scripts", "script", "--git", "v1"])
+        self.assertEqual(commands[0].git, "v1")
+
+    def test_global_options(self):
+        global_args, commands = parse(["--profile-output", "pics", "pics", "remove-jpg"])
+        self.assertEqual(global_args, ["--profile-output", "pics"])
+        self.assertEqual(commands[0].handler, cli.run_pics_remove_jpg)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from fix_card_name_coments import DEFAULT_RULES, LINT_RULES, lint_script_text
+
+def lint(text, rules=DEFAULT_RULES, name="Card Name"):
+    return lint_script_text(text, name, rules)[0]
+
+class NameRuleTest(unittest.TestCase):
+    def test_fixes_the_second_line(self):
+        self.assertEqual(lint("--Header\n--Old Name\nlocal s,id=GetID()\n"), "--Header\n--Card Name\nlocal s,id=GetID()\n")
+
+    def test_keeps_crlf(self):
+        self.assertEqual(lint("--Header\r\n--Old Name\r\nx\r\n"), "--Header\r\n--Card Name\r\nx\r\n")
+
+    def test_ignores_a_second_line_without_comment(self):
+        self.assertEqual(lint("--Header\nlocal s,id=GetID()\n"), "--Header\nlocal s,id=GetID()\n")
+
+class CommentSpaceRuleTest(unittest.TestCase):
+    def test_removes_the_first_space(self):
+        self.assertEqual(lint("--Header\n--Card Name\n-- text\n  -- indented\n--  two\n"),
+                         "--Header\n--Card Name\n--text\n  --indented\n-- two\n")
+
+    def test_leaves_bare_comment_lines_alone(self):
+        text = "--Header\n--Card Name\n-- \n--  \r\n"
+        self.assertEqual(lint(text), text)
+
+    def test_leaves_code_comments_alone(self):
+        text = "--Header\n--Card Name\nlocal x = 1 -- comment\n"
+        self.assertEqual(lint(text), text)
+
+class LineRulesTest(unittest.TestCase):
+    def test_scripted_by_keeps_the_author(self):
+        self.assertEqual(lint("--scripted   by  Someone\n", ("scripted-by",)), "--Scripted by Someone\n")
+
+    def test_scripted_by_without_author_has_no_trailing_space(self):
+        self.assertEqual(lint("--scripted   by\r\n", ("scripted-by",)), "--Scripted by\r\n")
+        self.assertEqual(lint("--scripted   by  \r\n", LINT_RULES), "--Scripted by\n")
+
+    def test_trailing_whitespace_keeps_crlf(self):
+        self.assertEqual(lint("a  \r\nb\t\n", ("trailing-whitespace",)), "a\r\nb\n")
+
+    def test_crlf(self):
+        self.assertEqual(lint("a\r\nb\r\n", ("crlf",)), "a\nb\n")
+
+    def test_getid(self):
+        fixed, problems = lint_script_text("local  s , id = GetID( )\n", "", ("getid",))
+        self.assertEqual((fixed, problems), ("local s,id=GetID()\n", []))
+        self.assertEqual(lint_script_text("local s=1\n", "", ("getid",))[1], ["missing 'local s,id=GetID()'"])
+
+    def test_all_rules_together(self):
+        text = "--Header \r\n--Old Name\r\n-- scripted by  Someone \r\nlocal s, id=GetID()\t\r\n-- note\r\n-- \r\n"
+        expected = "--Header\n--Card Name\n--Scripted by Someone\nlocal s,id=GetID()\n--note\n--\n"
+        self.assertEqual(lint(text, LINT_RULES), expected)
+        # Linting is idempotent, so a fixed script passes every rule
+        self.assertEqual(lint(expected, LINT_RULES), expected)
+
+if __name__ == "__main__":
+    unittest.main()